@@ -0,0 +1,180 @@
+"""
+In-process stand-ins for the OpenLattice APIs, with a fixed latency per call.
+
+They let the benchmarks measure how many round trips a code path makes without a live stack.
+"""
+
+import time
+import uuid
+import openlattice
+
+
+class FakeEdmApi(object):
+
+    def __init__(self, n_entity_types = 50, n_property_types = 500, latency = 0.05):
+        self.latency = latency
+        self.calls = 0
+        self.api_client = openlattice.ApiClient(openlattice.Configuration())
+        self.property_types = [
+            openlattice.PropertyType(
+                id = str(uuid.uuid4()),
+                type = openlattice.FullQualifiedName(namespace = "bench", name = f"property{i}"),
+                title = f"property{i}",
+                description = "",
+                schemas = [],
+                datatype = ["String", "Int64", "Date", "Boolean"][i % 4]
+            ) for i in range(n_property_types)
+        ]
+        self.entity_types = [
+            openlattice.EntityType(
+                id = str(uuid.uuid4()),
+                type = openlattice.FullQualifiedName(namespace = "bench", name = f"entity{i}"),
+                title = f"entity{i}",
+                description = "",
+                schemas = [],
+                key = [self.property_types[0].id],
+                properties = [x.id for x in self.property_types],
+                category = "EntityType"
+            ) for i in range(n_entity_types)
+        ]
+        self.association_types = [
+            openlattice.AssociationType(
+                entity_type = openlattice.EntityType(
+                    id = str(uuid.uuid4()),
+                    type = openlattice.FullQualifiedName(namespace = "bench", name = "association"),
+                    title = "association",
+                    description = "",
+                    schemas = [],
+                    key = [self.property_types[0].id],
+                    properties = [x.id for x in self.property_types],
+                    category = "AssociationType"
+                ),
+                src = [x.id for x in self.entity_types],
+                dst = [x.id for x in self.entity_types],
+                bidirectional = False
+            )
+        ]
+
+    def _call(self):
+        self.calls += 1
+        time.sleep(self.latency)
+
+    def _find(self, objects, namespace, name):
+        for x in objects:
+            if x.type.namespace == namespace and x.type.name == name:
+                return x.id
+        raise openlattice.rest.ApiException(status = 404, reason = "Not found")
+
+    def get_entity_data_model_version(self):
+        self._call()
+        return "v1"
+
+    def get_all_property_types(self):
+        self._call()
+        return self.property_types
+
+    def get_all_entity_types(self):
+        self._call()
+        return self.entity_types + [x.entity_type for x in self.association_types]
+
+    def get_all_association_types(self):
+        self._call()
+        return self.association_types
+
+    def get_property_type_id(self, namespace, name):
+        self._call()
+        return self._find(self.property_types, namespace, name)
+
+    def get_entity_type_id(self, namespace, name):
+        self._call()
+        return self._find(self.entity_types + [x.entity_type for x in self.association_types], namespace, name)
+
+    def get_property_type(self, property_type_id):
+        self._call()
+        return next(x for x in self.property_types if x.id == property_type_id)
+
+    def get_entity_type(self, entity_type_id):
+        self._call()
+        return next(x for x in self.entity_types + [x.entity_type for x in self.association_types] if x.id == entity_type_id)
+
+    def get_association_type(self, association_type_id):
+        self._call()
+        return next(x for x in self.association_types if x.entity_type.id == association_type_id)
+
+
+class FakeEntitySetsApi(object):
+
+    def __init__(self, edm_api, latency = 0.05):
+        self.latency = latency
+        self.calls = 0
+        self.entity_sets = [
+            openlattice.EntitySet(
+                id = str(uuid.uuid4()),
+                entity_type_id = entity_type.id,
+                name = f"BenchEntitySet{i}",
+                title = f"BenchEntitySet{i}",
+                description = "",
+                contacts = []
+            ) for i, entity_type in enumerate(edm_api.entity_types)
+        ]
+
+    def _call(self):
+        self.calls += 1
+        time.sleep(self.latency)
+
+    def get_all_entity_sets(self):
+        self._call()
+        return self.entity_sets
+
+    def get_entity_set_id(self, entity_set_name):
+        self._call()
+        for x in self.entity_sets:
+            if x.name == entity_set_name:
+                return x.id
+        raise openlattice.rest.ApiException(status = 404, reason = "Not found")
+
+    def get_entity_set(self, entity_set_id):
+        self._call()
+        return next(x for x in self.entity_sets if x.id == entity_set_id)
+
+
+def make_flight_string(n_entities = 20, n_properties = 15):
+    """
+    Writes a shuttle flight with n_entities entity definitions, chained by associations.
+    """
+
+    lines = ["organizationId: 00000000-0000-0000-0000-000000000000", "entityDefinitions:"]
+    for i in range(n_entities):
+        lines += [
+            f"  entity{i}:",
+            f'    fqn: "bench.entity{i}"',
+            f'    entitySetName: "BenchEntitySet{i}"',
+            f'    updateType: "Merge"',
+            f"    propertyDefinitions:"
+        ]
+        for j in range(n_properties):
+            lines += [
+                f"      bench.property{j}:",
+                f'        type: "bench.property{j}"',
+                f"        transforms:",
+                f"          - !<transforms.ConcatTransform>",
+                f'            columns: ["column{j}", "column{j + 1}"]',
+                f'            separator: "-"'
+            ]
+        lines += [f'    name: "entity{i}"', ""]
+    lines.append("associationDefinitions:")
+    for i in range(n_entities - 1):
+        lines += [
+            f"  association{i}:",
+            f'    fqn: "bench.association"',
+            f'    entitySetName: "BenchAssociations"',
+            f'    src: "entity{i}"',
+            f'    dst: "entity{i + 1}"',
+            f"    propertyDefinitions:",
+            f"      bench.property0:",
+            f'        type: "bench.property0"',
+            f'        column: "column0"',
+            f'    name: "association{i}"',
+            ""
+        ]
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,57 @@
+"""
+Compares cold and warm starts of Flight.deserialize + Flight.flight_validation.
+
+- uncached: every definition talks to the EdmApi directly (the behaviour before EdmCache)
+- cold: a new process with an empty EDM snapshot (bulk load, then the snapshot is written)
+- warm: a new process with a fresh snapshot on disk (no EDM calls at all)
+
+Run with: python benchmarks/bench_edm_snapshot.py [latency in seconds]
+"""
+
+import contextlib
+import tempfile
+import time
+import sys
+import io
+import os
+
+import openlattice
+from olpy.flight import Flight, edm
+
+from _fakes import FakeEdmApi, FakeEntitySetsApi, make_flight_string
+
+
+def run(flight_path, edm_api, entity_sets_api):
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        flight = Flight(configuration = openlattice.Configuration(), edm_cache = edm_api)
+        flight.entity_sets_api = entity_sets_api
+        flight.deserialize(flight_path)
+        flight.flight_validation()
+    return time.perf_counter() - start
+
+
+def main(latency = 0.02):
+    with tempfile.TemporaryDirectory() as directory:
+        flight_path = os.path.join(directory, "flight.yaml")
+        with open(flight_path, "w") as fl:
+            fl.write(make_flight_string())
+        snapshot_path = os.path.join(directory, "edm.sqlite")
+
+        api = FakeEdmApi(latency = latency)
+        entity_sets_api = FakeEntitySetsApi(api, latency = latency)
+
+        results = []
+        results.append(("uncached", run(flight_path, api, entity_sets_api), api.calls))
+        for label in ["cold", "warm"]:
+            api.calls = 0
+            cache = edm.EdmCache(api, snapshot_path = snapshot_path, ttl = 3600)
+            results.append((label, run(flight_path, cache, entity_sets_api), api.calls))
+
+    print(f"{'run':<10}{'seconds':>10}{'edm calls':>12}")
+    for label, seconds, calls in results:
+        print(f"{label:<10}{seconds:>10.3f}{calls:>12}")
+
+
+if __name__ == "__main__":
+    main(*[float(x) for x in sys.argv[1:]])
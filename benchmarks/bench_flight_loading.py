@@ -0,0 +1,38 @@
+"""
+Compares the yaml loading step of Flight.deserialize_from_string on a ~10k line flight.
+
+- munged: the old approach (str.replace passes over the text, then yaml.FullLoader)
+- native: the libyaml-backed loader with constructors for shuttle's !<...> tags
+
+Run with: python benchmarks/bench_flight_loading.py [number of repeats]
+"""
+
+import timeit
+import sys
+
+import yaml
+from olpy.flight.flight import _load_flight_dict
+
+from _fakes import make_flight_string
+
+
+def load_munged(string):
+    reformat = "\n".join(string.split("\n"))
+    reformat = reformat.replace("!<generators.TransformSeriesGenerator>","")
+    reformat = reformat.replace("- !<","- ")
+    reformat = reformat.replace(">",":")
+    return yaml.load(reformat, Loader=yaml.FullLoader)
+
+
+def main(repeats = 5):
+    repeats = int(repeats)
+    string = make_flight_string(n_entities = 105, n_properties = 15)
+    print(f"Flight with {len(string.splitlines())} lines, libyaml available: {yaml.__with_libyaml__}")
+    print(f"{'loader':<10}{'seconds per load':>20}")
+    for label, loader in [("munged", load_munged), ("native", _load_flight_dict)]:
+        seconds = min(timeit.repeat(lambda: loader(string), number = 1, repeat = repeats))
+        print(f"{label:<10}{seconds:>20.3f}")
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:])
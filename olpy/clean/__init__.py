@@ -1,2 +1,2 @@
-from . import atlas, utils, report
+from . import atlas, utils, report, datetimes
 from olpy.clean.atlas import *
\ No newline at end of file
@@ -1,14 +1,17 @@
 from pytz import timezone
 import sqlalchemy as sq
 import pandas as pd
+import numpy as np
 import openlattice
 import datetime
+import threading
+import io
 import urllib
 import yaml
 import olpy
 import re
 import os
-from geoalchemy2 import Geometry, WKTElement
+from geoalchemy2 import Geometry, WKBElement, WKTElement
 
 def get_temp_table_name(table_name, dt=datetime.datetime.now(timezone("US/Pacific"))):
     """
@@ -73,12 +76,13 @@ def drop_table(engine, table_name):
     except Exception as e:
         print(f"Could not drop main table due to {str(e)}")
 
-def overwrite_tables(df, table_name, engine, geom_data_type = None, geometry_col = None, crs = None):
+def overwrite_tables(df, table_name, engine, geom_data_type = None, geometry_col = None, crs = None, method = None):
     """
     Overwrites tables without deleting table by truncating table first
     then appending data
     If table does not exist, then pass the truncation and append
     If table names change, then error out
+    method is passed on to DataFrame.to_sql, where "copy" uploads with COPY (see psql_insert_copy)
     """
     try:
         engine.execute(f"TRUNCATE TABLE {table_name}")
@@ -91,9 +95,68 @@ def overwrite_tables(df, table_name, engine, geom_data_type = None, geometry_col
                    engine, 
                    if_exists='append', 
                     index=False, 
-                    dtype={geometry_col: Geometry(geom_data_type, srid= crs)})
+                    dtype={geometry_col: Geometry(geom_data_type, srid= crs)},
+                    method=to_sql_method(method))
     else:
-        df.to_sql(table_name, engine, if_exists = "append", index = False)
+        df.to_sql(table_name, engine, if_exists = "append", index = False, method = to_sql_method(method))
+
+
+def psql_insert_copy(table, conn, keys, data_iter):
+    """
+    Inserts rows with COPY ... FROM STDIN, for use as the method of DataFrame.to_sql on PostgreSQL
+
+    Rows are written to an in-memory buffer in COPY's text format, so values are sent as their
+    text representation rather than through the SQLAlchemy column types. Geometries are written with
+    the SRID of their column (or element), as COPY doesn't apply the column's SRID itself.
+    The table itself is still created by to_sql, with the dtypes it is given.
+    """
+
+    srids = [getattr(table.table.columns[key].type, "srid", None) if key in table.table.columns else None for key in keys]
+    buffer = io.StringIO()
+    for row in data_iter:
+        buffer.write("\t".join(_copy_text(value, srid) for value, srid in zip(row, srids)))
+        buffer.write("\n")
+    buffer.seek(0)
+
+    name = '"%s"' % table.name
+    if table.schema:
+        name = '"%s".%s' % (table.schema, name)
+    with conn.connection.cursor() as cursor:
+        cursor.copy_expert(f"COPY {name} ({cols_to_string_with_dubquotes(keys)}) FROM STDIN", buffer)
+
+
+def to_sql_method(method):
+    """
+    Gets the method argument for DataFrame.to_sql, where "copy" stands for psql_insert_copy.
+    """
+
+    return psql_insert_copy if method == "copy" else method
+
+
+def _copy_text(value, srid = None):
+    """
+    Formats a value for COPY's text format: NULL as \\N, integral floats (e.g. from integer columns
+    with nulls) as integers, bytes as bytea hex, and escapes backslashes, tabs and newlines.
+
+    Spatial elements, and WKT or hex WKB strings for a geometry column with an srid, are written
+    as EWKT/EWKB (SRID=<srid>;...), with the element's own SRID if it has one.
+    """
+
+    if value is None:
+        return "\\N"
+    if isinstance(value, (WKTElement, WKBElement)):
+        if value.extended:
+            srid = None
+        elif value.srid is not None and value.srid > 0:
+            srid = value.srid
+        value = value.desc
+    if isinstance(value, str) and srid is not None and srid > 0 and not value.upper().startswith("SRID="):
+        value = "SRID=%d;%s" % (srid, value)
+    elif isinstance(value, (float, np.floating)) and float(value).is_integer():
+        value = int(value)
+    elif isinstance(value, (bytes, bytearray, memoryview)):
+        value = "\\x" + bytes(value).hex()
+    return str(value).replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
 
 
 def get_atlas_engine_from_mapper(config_file, datasource):
@@ -170,6 +233,25 @@ def get_cols_from_sql(sql, con):
 
     return pd.read_sql(limit_query(sql, 1), con).columns
 
+
+def read_sql_chunks(sql, engine, chunksize):
+    """
+    Yields the result of a query as pandas.DataFrames of up to chunksize rows.
+
+    Unlike pd.read_sql(..., chunksize=...), which gets the whole result from the database first,
+    rows are fetched through a server-side cursor, on a connection of their own, as the chunks are asked for.
+    """
+
+    with engine.connect() as connection:
+        streaming = connection.execution_options(stream_results=True, max_row_buffer=chunksize)
+        result = streaming.exec_driver_sql(sql)
+        columns = list(result.keys())
+        while True:
+            rows = result.fetchmany(chunksize)
+            if not rows:
+                return
+            yield pd.DataFrame.from_records(rows, columns=columns, coerce_float=True)
+
 def get_datatypes(table_name, engine):
     '''
     Gets a pandas.DataFrame with column datatypes for a given table and sqlalchemy.Engine
@@ -178,9 +260,196 @@ def get_datatypes(table_name, engine):
     :param engine: sqlalchemy.Engine
     :return: pandas.DataFrame
     '''
-    dt_list = '''
-    SELECT column_name, data_type
+    return get_datatypes_for_tables([table_name], engine).drop(columns = "table_name").set_index('column_name')
+
+def get_datatypes_for_tables(table_names, engine):
+    '''
+    Gets a pandas.DataFrame with column datatypes for many tables, with a single catalog query
+
+    :param table_names: list of strings
+    :param engine: sqlalchemy.Engine
+    :return: pandas.DataFrame with columns table_name, column_name and data_type
+    '''
+    dt_list = sq.text('''
+    SELECT table_name, column_name, data_type
     FROM information_schema.columns
-    where table_name = '{table_name}';
-    '''.format(table_name=table_name)
-    return pd.read_sql(dt_list, engine).set_index('column_name')
\ No newline at end of file
+    where table_name = ANY(:table_names);
+    ''')
+    return pd.read_sql(dt_list, engine, params = {"table_names": list(table_names)})
+
+
+# pg_type.typcategory of the types min/max are computed for: numeric, string and date/time
+_ORDERED_CATEGORIES = {"N", "S", "D"}
+_profiles = dict()
+_profiles_lock = threading.Lock()
+
+
+class TableProfile(object):
+    """
+    Statistics of a table, query or pandas.DataFrame, as computed by profile()
+
+    row_count is the number of rows. columns is a pandas.DataFrame indexed by column name with the number
+    of nulls, the (approximate) number of distinct values, min, max and the min/max/mean length of the
+    values as text. groups maps tuples of columns to the exact number of distinct combinations.
+    """
+
+    def __init__(self, row_count, columns, groups):
+        self.row_count = row_count
+        self.columns = columns
+        self.groups = groups
+
+    def covers(self, columns, column_groups):
+        """
+        Checks whether this profile has the statistics of all the given columns and column groups.
+        """
+
+        return set(columns) <= set(self.columns.index) and set(column_groups) <= set(self.groups.keys())
+
+    def get_mean_row_length(self):
+        """
+        Gets the mean length of a row (the profiled columns only) as text, e.g. to plan capacity.
+        """
+
+        return float(self.columns["mean_length"].fillna(0).sum())
+
+
+def profile(table_name = None, engine = None, sql = None, df = None, columns = None, column_groups = None, distinct_sampling = 16, refresh = False):
+    '''
+    Profiles the columns of a table, a query or a pandas.DataFrame, with one pass over the data
+
+    Distinct counts of single columns are estimated by hash sampling: only the values hashing to 0
+    modulo distinct_sampling are counted (distinctly), and the count is scaled back up. Use
+    distinct_sampling = 1 for exact counts. Distinct counts of column_groups are always exact.
+    Profiles of tables and queries are cached per engine and source, and reused as long as they cover
+    the requested columns.
+
+    :param columns: columns to profile, e.g. Flight.get_all_columns(). Those not in the source are skipped. Default all.
+    :param column_groups: list of tuples of columns, e.g. primary keys, to count distinct combinations of
+    :return: TableProfile
+    '''
+
+    column_groups = [tuple(group) for group in (column_groups or [])]
+    if df is not None:
+        columns = [c for c in df.columns if columns is None or c in columns]
+        return _profile_dataframe(df, columns, column_groups)
+
+    if table_name:
+        source = '"%s"' % table_name
+    elif sql:
+        source = "(%s) foo" % sql.replace(";", "")
+    else:
+        raise ValueError("Profiling needs a table name, a query or a DataFrame.")
+
+    key = (str(engine.url), source)
+    with _profiles_lock:
+        cached = _profiles.get(key)
+    categories = _get_column_categories(source, engine)
+    columns = [c for c in categories.keys() if columns is None or c in columns]
+    if cached is not None and not refresh and cached.covers(columns, column_groups):
+        olpy.clean.report.count("cache_hits")
+        return cached
+
+    olpy.clean.report.count("cache_misses")
+    missing = set(c for group in column_groups for c in group) - set(categories.keys())
+    if missing:
+        raise ValueError(f"Columns {sorted(missing)} of the column groups are not in {source}.")
+    result = _profile_source(source, engine, {c: categories[c] for c in columns}, column_groups, distinct_sampling)
+    with _profiles_lock:
+        _profiles[key] = result
+    return result
+
+
+def clear_profile_cache():
+    """
+    Drops all cached profiles, e.g. after the source tables changed.
+    """
+
+    with _profiles_lock:
+        _profiles.clear()
+
+
+def _get_column_categories(source, engine):
+    # the result description of an empty select has the type of every column, for queries as well as tables
+    connection = engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        cursor.execute("SELECT * FROM %s LIMIT 0" % source)
+        types = [(d[0], d[1]) for d in cursor.description]
+        cursor.execute("SELECT oid::bigint, typcategory FROM pg_type WHERE oid::bigint = ANY(%s)", (list(set(t for _, t in types)),))
+        categories = dict(cursor.fetchall())
+    finally:
+        connection.close()
+    return {name: categories.get(type_oid) for name, type_oid in types}
+
+
+def _profile_source(source, engine, categories, column_groups, distinct_sampling):
+    selects = ["count(*)"]
+    for column, category in categories.items():
+        quoted = '"%s"' % column.replace('"', '""')
+        text = "%s::text" % quoted
+        sampled = "" if distinct_sampling == 1 else " FILTER (WHERE mod(hashtext(%s), %d) = 0)" % (text, distinct_sampling)
+        ordered = category in _ORDERED_CATEGORIES
+        selects += [
+            "count(%s)" % quoted,
+            "count(DISTINCT %s)%s" % (text, sampled),
+            "min(%s)" % quoted if ordered else "NULL",
+            "max(%s)" % quoted if ordered else "NULL",
+            "min(length(%s))" % text,
+            "max(length(%s))" % text,
+            "avg(length(%s))" % text
+        ]
+    for group in column_groups:
+        selects.append("count(DISTINCT (%s))" % cols_to_string_with_dubquotes(group))
+
+    query = "SELECT %s FROM %s;" % (", ".join("%s AS s%d" % (s, i) for i, s in enumerate(selects)), source)
+    values = pd.read_sql(query, engine).iloc[0].tolist()
+
+    row_count = int(values[0])
+    stats = []
+    for i, column in enumerate(categories.keys()):
+        non_null, distinct, minimum, maximum, min_length, max_length, mean_length = values[1 + 7 * i:8 + 7 * i]
+        stats.append({
+            "column_name": column,
+            "nulls": row_count - int(non_null),
+            "distinct": int(distinct) * distinct_sampling,
+            "min": minimum,
+            "max": maximum,
+            "min_length": min_length,
+            "max_length": max_length,
+            "mean_length": None if mean_length is None else float(mean_length)
+        })
+    groups = {group: int(n) for group, n in zip(column_groups, values[1 + 7 * len(categories):])}
+    return TableProfile(row_count, _stats_frame(stats), groups)
+
+
+def _profile_dataframe(df, columns, column_groups):
+    stats = []
+    for column in columns:
+        values = df[column].dropna()
+        # as in the database, values are compared (for distinct counts) and measured as text
+        strings = values.astype(str)
+        lengths = strings.str.len()
+        try:
+            minimum, maximum = values.min(), values.max()
+        except TypeError:
+            # mixed types without an order
+            minimum, maximum = None, None
+        stats.append({
+            "column_name": column,
+            "nulls": int(df.shape[0] - values.shape[0]),
+            "distinct": int(strings.nunique()),
+            "min": minimum,
+            "max": maximum,
+            "min_length": lengths.min() if not lengths.empty else None,
+            "max_length": lengths.max() if not lengths.empty else None,
+            "mean_length": float(lengths.mean()) if not lengths.empty else None
+        })
+    groups = {group: int(df[list(group)].drop_duplicates().shape[0]) for group in column_groups}
+    return TableProfile(int(df.shape[0]), _stats_frame(stats), groups)
+
+
+def _stats_frame(stats):
+    return pd.DataFrame(
+        stats,
+        columns = ["column_name", "nulls", "distinct", "min", "max", "min_length", "max_length", "mean_length"]
+    ).set_index("column_name")
@@ -0,0 +1,222 @@
+import pandas as pd
+import re
+
+# java DateTimeFormatter letters -> strptime directives, by the number of repeated letters (last one covers longer runs)
+_JAVA_DIRECTIVES = {
+    "y": ["%Y", "%y", "%Y"],
+    "u": ["%Y", "%y", "%Y"],
+    "M": ["%m", "%m", "%b", "%B"],
+    "L": ["%m", "%m", "%b", "%B"],
+    "d": ["%d"],
+    "D": ["%j"],
+    "H": ["%H"],
+    "h": ["%I"],
+    "K": ["%I"],
+    "m": ["%M"],
+    "s": ["%S"],
+    "S": ["%f"],
+    "a": ["%p"],
+    "E": ["%a", "%a", "%a", "%A"],
+    "Z": ["%z"],
+    "X": ["%z"],
+    "x": ["%z"],
+    "z": ["%Z"]
+}
+
+# strptime is lenient about widths where java isn't: these regexes enforce java's widths
+_JAVA_WIDTHS = {
+    "y": ["\\d{4}", "\\d{2}", "\\d{4}"],
+    "u": ["\\d{4}", "\\d{2}", "\\d{4}"],
+    "M": ["\\d{1,2}", "\\d{2}", "[A-Za-z]{3}", "[A-Za-z]+"],
+    "L": ["\\d{1,2}", "\\d{2}", "[A-Za-z]{3}", "[A-Za-z]+"],
+    "D": ["\\d{1,3}", "\\d{2,3}", "\\d{3}"],
+    "a": ["[AaPp][Mm]"],
+    "E": ["[A-Za-z]{3}", "[A-Za-z]{3}", "[A-Za-z]{3}", "[A-Za-z]+"],
+    "Z": ["Z|[+-]\\d{2}:?\\d{2}"],
+    "X": ["Z|[+-]\\d{2}(:?\\d{2})?"],
+    "x": ["[+-]\\d{2}(:?\\d{2})?"],
+    "z": ["\\S+"]
+}
+
+# candidates for infer_patterns, roughly from most to least common
+DATE_PATTERNS = [
+    "yyyy-MM-dd", "MM/dd/yyyy", "M/d/yyyy", "MM/dd/yy", "M/d/yy", "yyyy/MM/dd", "MM-dd-yyyy",
+    "dd-MMM-yyyy", "dd-MMM-yy", "yyyyMMdd", "MMM d, yyyy", "MMMM d, yyyy",
+    "yyyy-MM-dd HH:mm:ss", "yyyy-MM-dd HH:mm:ss.S", "yyyy-MM-dd HH:mm:ss.SS", "yyyy-MM-dd HH:mm:ss.SSS",
+    "MM/dd/yyyy HH:mm:ss", "M/d/yyyy H:mm", "M/d/yyyy h:mm a", "M/d/yyyy h:mm:ss a"
+]
+DATETIME_PATTERNS = [
+    "yyyy-MM-dd HH:mm:ss", "yyyy-MM-dd HH:mm:ss.S", "yyyy-MM-dd HH:mm:ss.SS", "yyyy-MM-dd HH:mm:ss.SSS",
+    "yyyy-MM-dd HH:mm:ss.SSSSSS", "yyyy-MM-dd'T'HH:mm:ss", "yyyy-MM-dd'T'HH:mm:ss.SSS", "yyyy-MM-dd'T'HH:mm:ssXXX",
+    "yyyy-MM-dd'T'HH:mm:ss.SSSXXX", "yyyy-MM-dd HH:mm", "MM/dd/yyyy HH:mm:ss", "MM/dd/yyyy HH:mm", "M/d/yyyy H:mm",
+    "M/d/yyyy h:mm a", "M/d/yyyy h:mm:ss a", "M/d/yy H:mm", "M/d/yy h:mm a", "yyyyMMddHHmmss",
+    "yyyy-MM-dd", "MM/dd/yyyy", "M/d/yyyy"
+]
+TIME_PATTERNS = [
+    "HH:mm:ss", "HH:mm:ss.S", "HH:mm:ss.SS", "HH:mm:ss.SSS", "HH:mm", "H:mm", "h:mm a", "h:mm:ss a", "HHmm", "HHmmss"
+]
+
+
+def java_to_strptime(pattern):
+    """
+    Converts a java date pattern (as used by shuttle's date transforms) to a strptime format.
+
+    Literal text may be quoted as in java ('T'). Returns None for patterns using letters
+    that have no strptime equivalent (e.g. week-based years or nanoseconds).
+    """
+
+    tokens = _tokenize(pattern)
+    if tokens is None:
+        return None
+    out = ""
+    for letter, text in tokens:
+        if letter:
+            directives = _JAVA_DIRECTIVES[letter]
+            out += directives[min(len(text), len(directives)) - 1]
+        else:
+            out += text.replace("%", "%%")
+    return out
+
+
+def java_to_regex(pattern):
+    """
+    Converts a java date pattern to a regular expression enforcing java's field widths.
+
+    Returns None where java_to_strptime does.
+    """
+
+    tokens = _tokenize(pattern)
+    if tokens is None:
+        return None
+    out = ""
+    for letter, text in tokens:
+        if not letter:
+            out += re.escape(text)
+        elif letter in _JAVA_WIDTHS:
+            widths = _JAVA_WIDTHS[letter]
+            out += "(" + widths[min(len(text), len(widths)) - 1] + ")"
+        elif letter == "S":
+            out += "\\d{%d}" % len(text)
+        else:
+            # one letter means one or two digits, more letters mean exactly that many
+            out += "\\d{1,2}" if len(text) == 1 else "\\d{%d}" % len(text)
+    return out
+
+
+def parses(values, patterns):
+    """
+    Determines which values parse with at least one of the java date patterns.
+
+    :param values: pandas.Series of strings (nulls are reported as not parsing)
+    :param patterns: list of java date patterns
+    :return: boolean pandas.Series aligned with values
+    """
+
+    parsed = pd.Series(False, index = range(values.shape[0]))
+    strings = values.reset_index(drop = True)
+    for pattern in patterns:
+        remaining = strings[~parsed]
+        if remaining.empty:
+            break
+        parsed[remaining.index] = _parse(remaining, pattern)
+    return pd.Series(parsed.values, index = values.index)
+
+
+def parse_rates(values, patterns):
+    """
+    Gets the fraction of the (non-null) values that parse with each java date pattern.
+
+    :return: dict of pattern: rate
+    """
+
+    values = values.dropna()
+    if values.empty:
+        return {pattern: 0. for pattern in patterns}
+    return {pattern: float(_parse(values, pattern).mean()) for pattern in patterns}
+
+
+def infer_patterns(values, candidates = DATETIME_PATTERNS, max_patterns = 5):
+    """
+    Finds a small set of java date patterns that together parse the values.
+
+    Every candidate is scored on all values at once; then, greedily, the candidate parsing the most
+    values not covered yet is picked, until everything is covered or no candidate adds anything.
+    Ties go to the candidate listed first.
+
+    :param values: pandas.Series of strings, e.g. a sample of the source column
+    :return: list of patterns, in order of coverage
+    """
+
+    values = values.dropna().astype(str).str.strip()
+    values = values[values != ""].reset_index(drop = True)
+    parsed = {pattern: _parse(values, pattern) for pattern in candidates}
+    remaining = pd.Series(True, index = values.index)
+    out = []
+    while remaining.any() and len(out) < max_patterns:
+        gains = {pattern: int((mask & remaining).sum()) for pattern, mask in parsed.items() if pattern not in out}
+        if not gains:
+            break
+        best = max(gains, key = gains.get)
+        if gains[best] == 0:
+            break
+        out.append(best)
+        remaining &= ~parsed[best]
+    return out
+
+
+def has_time(pattern):
+    """
+    Determines whether a java date pattern has time of day fields (hours, minutes, seconds, ...).
+    """
+
+    tokens = _tokenize(pattern) or []
+    return any(letter and letter in "HhKkmsSaAn" for letter, text in tokens)
+
+
+def _parse(values, pattern):
+    """
+    Gets a boolean pandas.Series indicating which values parse with the java pattern.
+    """
+
+    strptime = java_to_strptime(pattern)
+    if strptime is None:
+        return pd.Series(False, index = values.index)
+    strings = values.astype(str).str.strip()
+    parsed = pd.to_datetime(strings, format = strptime, errors = "coerce", utc = "%z" in strptime)
+    return parsed.notna() & strings.str.fullmatch(java_to_regex(pattern)) & values.notna()
+
+
+def _tokenize(pattern):
+    """
+    Splits a java date pattern into (letter, run of letters) and ("", literal text) tokens.
+    """
+
+    tokens = []
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if char == "'":
+            # quoted literal, where '' stands for a single quote
+            literal = ""
+            i += 1
+            while True:
+                end = pattern.find("'", i)
+                if end == -1:
+                    return None
+                literal += pattern[i:end]
+                if pattern[end + 1:end + 2] != "'":
+                    break
+                literal += "'"
+                i = end + 2
+            tokens.append(("", literal or "'"))
+            i = end + 1
+        elif char.isalpha():
+            if char not in _JAVA_DIRECTIVES:
+                return None
+            run = len(pattern) - i - len(pattern[i:].lstrip(char))
+            tokens.append((char, char * run))
+            i += run
+        else:
+            tokens.append(("", char))
+            i += 1
+    return tokens
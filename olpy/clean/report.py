@@ -1,6 +1,10 @@
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, asdict
 import collections
+import functools
+import threading
 import random
+import json
+import time
 
 @dataclass
 class ValidationReport:
@@ -12,6 +16,11 @@ class ValidationReport:
     validated: bool = True
     issues: list = field(default_factory=list)
     sub_reports: list = field(default_factory=list)
+    # filled in by instrumented validators
+    wall_time: float = None
+    api_calls: int = 0
+    cache_hits: int = 0
+    cache_misses: int = 0
 
 
     def __str__(self, level = 0):
@@ -36,6 +45,25 @@ class ValidationReport:
                 print("  - " + r)
             print()
 
+    def to_dict(self):
+        """
+        Gets the report (including its sub reports) as a dictionary.
+        """
+
+        return asdict(self)
+
+    def to_jsonl(self, fp):
+        """
+        Writes the report tree to a file handle as json lines, one report per line, parents first.
+
+        Every line holds the titles of the reports above it as "path" instead of the sub reports.
+        """
+
+        for path, report in _walk(self, []):
+            line = {k: v for k, v in asdict(report).items() if k != "sub_reports"}
+            line["path"] = path
+            fp.write(json.dumps(line, default = str) + "\n")
+
     def validate(self):
         if self in self.sub_reports:
             print("Someone goofed up and allowed self in self.sub_reports :(")
@@ -72,6 +100,71 @@ class ValidationReport:
             return random.choice(extra_enthusiasm)
         return random.choice(exclamations)
 
+_counters = threading.local()
+_counters_lock = threading.Lock()
+
+def count(event, n = 1):
+    """
+    Counts an event ("api_calls", "cache_hits" or "cache_misses") for the instrumented validators
+    running on this thread.
+    """
+
+    stack = getattr(_counters, "stack", [])
+    if stack:
+        with _counters_lock:
+            for counts in stack:
+                counts[event] += n
+
+def instrumented(validator):
+    """
+    Records the wall time and the counted events of a validator on the report it returns.
+
+    Nested validators count towards every instrumented validator they are called from on the same thread.
+    """
+
+    @functools.wraps(validator)
+    def instrumented_validator(*args, **kwargs):
+        if not hasattr(_counters, "stack"):
+            _counters.stack = []
+        counts = collections.Counter()
+        _counters.stack.append(counts)
+        start = time.perf_counter()
+        try:
+            report = validator(*args, **kwargs)
+        finally:
+            _counters.stack.pop()
+        if isinstance(report, ValidationReport):
+            report.wall_time = time.perf_counter() - start
+            report.api_calls = counts["api_calls"]
+            report.cache_hits = counts["cache_hits"]
+            report.cache_misses = counts["cache_misses"]
+        return report
+    return instrumented_validator
+
+def with_counters(function):
+    """
+    Wraps a function to be run on another thread, so that the events it counts also count towards the
+    instrumented validators currently running on this thread.
+    """
+
+    stack = list(getattr(_counters, "stack", []))
+
+    @functools.wraps(function)
+    def counted_function(*args, **kwargs):
+        previous = getattr(_counters, "stack", [])
+        _counters.stack = stack + previous
+        try:
+            return function(*args, **kwargs)
+        finally:
+            _counters.stack = previous
+    return counted_function
+
+def _walk(report, path):
+    path = path + [report.title]
+    yield path[:-1], report
+    for sub in report.sub_reports:
+        yield from _walk(sub, path)
+
 def _get_str_level(report, level):
 
     if level == 0 and len(report.title) > 0:
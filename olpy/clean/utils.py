@@ -164,4 +164,58 @@ def ensure_hashable(df):
                 return np.nan
             return frozenset(value)
         return value
-    return df.applymap(try_collapse)
\ No newline at end of file
+    return df.applymap(try_collapse)
+
+def is_blank(values):
+    """
+    Determines which values in a pandas.Series are null or blank strings (these are skipped by shuttle's parsers).
+    """
+
+    return values.isna() | values.astype(str).str.strip().eq("")
+
+
+def parses_as_int(values):
+    """
+    Determines which values in a pandas.Series can be parsed by ParseIntTransform.
+    """
+
+    if pd.api.types.is_integer_dtype(values) or pd.api.types.is_bool_dtype(values):
+        return pd.Series(True, index = values.index)
+    if pd.api.types.is_float_dtype(values):
+        return values.notna() & values.eq(values.round())
+    return values.astype(str).str.strip().str.fullmatch(r"[+-]?\d+")
+
+
+def parses_as_double(values):
+    """
+    Determines which values in a pandas.Series can be parsed by ParseDoubleTransform.
+    """
+
+    if pd.api.types.is_numeric_dtype(values):
+        return values.notna()
+    return pd.to_numeric(values.astype(str).str.strip(), errors = "coerce").notna()
+
+
+_BOOLEANS = {"true", "false", "t", "f", "yes", "no", "y", "n", "1", "0"}
+
+def parses_as_bool(values):
+    """
+    Determines which values in a pandas.Series can be parsed by ParseBoolTransform.
+    """
+
+    if pd.api.types.is_bool_dtype(values):
+        return pd.Series(True, index = values.index)
+    return values.astype(str).str.strip().str.lower().isin(_BOOLEANS)
+
+
+_POINT_PATTERN = r"\s*[+-]?\d+(\.\d*)?\s*,\s*[+-]?\d+(\.\d*)?\s*"
+_WKT_PATTERN = r"\s*(?i:(MULTI)?(POINT|LINESTRING|POLYGON)|GEOMETRYCOLLECTION)\s*\(.*\)\s*"
+
+def is_geography(values, datatype = "GeographyPoint"):
+    """
+    Determines which values in a pandas.Series are well formed for a geography datatype:
+    "latitude,longitude" for points, well-known text otherwise.
+    """
+
+    pattern = _POINT_PATTERN if datatype in {"GeographyPoint", "GeometryPoint"} else _WKT_PATTERN
+    return values.astype(str).str.fullmatch(pattern)
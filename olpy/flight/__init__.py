@@ -1,2 +1,2 @@
 from .flight import *
-from . import visuals
\ No newline at end of file
+from . import visuals, edm, validation
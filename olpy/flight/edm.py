@@ -0,0 +1,601 @@
+from collections import Counter, OrderedDict
+import threading
+import bisect
+import sqlite3
+import json
+import time
+import os
+import hashlib
+import openlattice
+
+from .. import clean, misc
+
+DEFAULT_SNAPSHOT_PATH = os.environ.get("OLPY_EDM_SNAPSHOT")
+DEFAULT_TTL = float(os.environ.get("OLPY_EDM_TTL", 3600))
+
+
+class EdmCache(object):
+    """
+    A caching stand-in for openlattice.EdmApi
+
+    Property, entity and association types are fetched in bulk (one call per kind) on first use
+    and indexed by fqn and by id. Lookups use the same method names and signatures as EdmApi, so
+    an EdmCache can be passed anywhere an edm_api is expected. Any method that isn't cached is
+    passed through to the wrapped EdmApi; calls that aren't getters invalidate the cache.
+
+    If a snapshot_path is given, the EDM is also persisted to a sqlite file. A snapshot younger
+    than ttl seconds is used without touching the network; an older one is reused if the EDM
+    version on the server hasn't changed.
+    """
+
+    def __init__(self, edm_api = None, snapshot_path = None, ttl = DEFAULT_TTL):
+        self.edm_api = edm_api
+        self.snapshot_path = snapshot_path
+        self.ttl = ttl
+        self.version = None
+        self._lock = threading.RLock()
+        self.invalidate()
+
+    def __getattr__(self, name):
+        edm_api = self.__dict__.get("edm_api")
+        if name.startswith("_") or edm_api is None:
+            raise AttributeError(name)
+        attribute = getattr(edm_api, name)
+        if callable(attribute) and not name.startswith("get_"):
+            def passthrough(*args, **kwargs):
+                clean.report.count("api_calls")
+                try:
+                    return attribute(*args, **kwargs)
+                finally:
+                    self.invalidate()
+            return passthrough
+        return attribute
+
+    def invalidate(self):
+        """
+        Drops everything that was cached. The next lookup reloads the EDM.
+        """
+
+        with self._lock:
+            self.loaded = False
+            self.property_types = dict()
+            self.entity_types = dict()
+            self.association_types = dict()
+            self.property_type_ids = dict()
+            self.entity_type_ids = dict()
+            self._name_indices = dict()
+            self._missing = set()
+
+    def load(self):
+        """
+        Loads the EDM from the snapshot if it is still valid, otherwise from the API.
+        """
+
+        with self._lock:
+            if self.snapshot_path and self.read_snapshot():
+                return
+            if self.edm_api is None:
+                raise ValueError("Can't load the EDM without an edm_api.")
+            self.version = self._get_remote_version()
+            clean.report.count("api_calls", 3)    # one bulk call per kind
+            self.index(
+                property_types = self.edm_api.get_all_property_types(),
+                entity_types = self.edm_api.get_all_entity_types(),
+                association_types = self.edm_api.get_all_association_types()
+            )
+            if self.snapshot_path:
+                self.write_snapshot()
+
+    def refresh(self):
+        """
+        Reloads the EDM from the API, bypassing (and then overwriting) the snapshot.
+        """
+
+        with self._lock:
+            snapshot_path = self.snapshot_path
+            self.snapshot_path = None
+            try:
+                self.load()
+            finally:
+                self.snapshot_path = snapshot_path
+            if self.snapshot_path:
+                self.write_snapshot()
+
+    def read_snapshot(self):
+        """
+        Indexes the EDM stored in the snapshot file.
+
+        :return: boolean indicator that the snapshot was fresh enough to be used
+        """
+
+        if not os.path.isfile(self.snapshot_path):
+            return False
+        host = self._get_host()
+        with sqlite3.connect(self.snapshot_path) as connection:
+            _create_snapshot_table(connection)
+            row = connection.execute(
+                "SELECT version, fetched_at FROM edm_snapshot WHERE host = ?", (host,)
+            ).fetchone()
+            if row is None:
+                return False
+            version, fetched_at = row
+            if time.time() - fetched_at > self.ttl:
+                # cheap staleness check: one small call instead of reloading the whole EDM
+                if self.edm_api is None or version is None or self._get_remote_version() != version:
+                    return False
+                connection.execute(
+                    "UPDATE edm_snapshot SET fetched_at = ? WHERE host = ?", (time.time(), host)
+                )
+            property_types, entity_types, association_types = connection.execute(
+                "SELECT property_types, entity_types, association_types FROM edm_snapshot WHERE host = ?", (host,)
+            ).fetchone()
+        self.version = version
+        self.index(
+            property_types = _from_json(property_types, "list[PropertyType]"),
+            entity_types = _from_json(entity_types, "list[EntityType]"),
+            association_types = _from_json(association_types, "list[AssociationType]")
+        )
+        return True
+
+    def write_snapshot(self):
+        """
+        Writes the currently cached EDM to the snapshot file.
+        """
+
+        directory = os.path.dirname(os.path.abspath(self.snapshot_path))
+        os.makedirs(directory, exist_ok = True)
+        with sqlite3.connect(self.snapshot_path) as connection:
+            _create_snapshot_table(connection)
+            connection.execute(
+                "INSERT OR REPLACE INTO edm_snapshot VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    self._get_host(),
+                    self.version,
+                    time.time(),
+                    _to_json(self.get_all_property_types()),
+                    _to_json(self.get_all_entity_types()),
+                    _to_json(self.get_all_association_types())
+                )
+            )
+
+    def get_version(self):
+        """
+        Gets the EDM version without loading the EDM: that of the loaded EDM, of a fresh snapshot, or from one small API call.
+        """
+
+        if self.loaded:
+            return self.version
+        if self.snapshot_path and os.path.isfile(self.snapshot_path):
+            with sqlite3.connect(self.snapshot_path) as connection:
+                _create_snapshot_table(connection)
+                row = connection.execute(
+                    "SELECT version, fetched_at FROM edm_snapshot WHERE host = ?", (self._get_host(),)
+                ).fetchone()
+            if row is not None and time.time() - row[1] <= self.ttl:
+                return row[0]
+        if self.edm_api is None:
+            return None
+        return self._get_remote_version()
+
+    def _get_host(self):
+        if self.edm_api is None:
+            return ""
+        return self.edm_api.api_client.configuration.host
+
+    def _get_remote_version(self):
+        try:
+            version = self.edm_api.get_entity_data_model_version()
+        except (AttributeError, openlattice.rest.ApiException):
+            return None
+        clean.report.count("api_calls")
+        return str(version)
+
+    def index(self, property_types = [], entity_types = [], association_types = []):
+        """
+        Replaces the cached EDM with the given lists of types.
+        """
+
+        with self._lock:
+            self.invalidate()
+            for property_type in property_types:
+                self.property_types[property_type.id] = property_type
+                self.property_type_ids[misc.get_fqn_string(property_type.type)] = property_type.id
+            for entity_type in entity_types:
+                self.entity_types[entity_type.id] = entity_type
+                self.entity_type_ids[misc.get_fqn_string(entity_type.type)] = entity_type.id
+            for association_type in association_types:
+                self.association_types[association_type.entity_type.id] = association_type
+                self.entity_types.setdefault(association_type.entity_type.id, association_type.entity_type)
+                self.entity_type_ids.setdefault(misc.get_fqn_string(association_type.entity_type.type), association_type.entity_type.id)
+            self.loaded = True
+
+    def ensure_loaded(self):
+        if not self.loaded:
+            with self._lock:
+                if not self.loaded:
+                    self.load()
+
+    def _lookup(self, index_name, key, fetch, description):
+        """
+        Reads from one of the indices, falling back on a single API call for objects that
+        were created after the bulk load. Misses are remembered so they're only tried once.
+        """
+
+        self.ensure_loaded()
+        cache = getattr(self, index_name)
+        if key in cache:
+            clean.report.count("cache_hits")
+            return cache[key]
+        clean.report.count("cache_misses")
+        if self.edm_api is None or (description, key) in self._missing:
+            raise _not_found(description, key)
+        try:
+            clean.report.count("api_calls")
+            value = fetch()
+        except openlattice.rest.ApiException:
+            with self._lock:
+                self._missing.add((description, key))
+            raise
+        with self._lock:
+            cache[key] = value
+        return value
+
+    def get_property_type_id(self, namespace, name):
+        fqn = f"{namespace}.{name}"
+        return self._lookup("property_type_ids", fqn,
+                            lambda: self.edm_api.get_property_type_id(namespace = namespace, name = name),
+                            "property type")
+
+    def get_property_type(self, property_type_id):
+        return self._lookup("property_types", property_type_id,
+                            lambda: self.edm_api.get_property_type(property_type_id),
+                            "property type")
+
+    def get_entity_type_id(self, namespace, name):
+        fqn = f"{namespace}.{name}"
+        return self._lookup("entity_type_ids", fqn,
+                            lambda: self.edm_api.get_entity_type_id(namespace = namespace, name = name),
+                            "entity type")
+
+    def get_entity_type(self, entity_type_id):
+        return self._lookup("entity_types", entity_type_id,
+                            lambda: self.edm_api.get_entity_type(entity_type_id),
+                            "entity type")
+
+    def get_association_type(self, association_type_id):
+        return self._lookup("association_types", association_type_id,
+                            lambda: self.edm_api.get_association_type(association_type_id),
+                            "association type")
+
+    def get_all_property_types(self):
+        self.ensure_loaded()
+        return list(self.property_types.values())
+
+    def get_all_entity_types(self):
+        self.ensure_loaded()
+        return list(self.entity_types.values())
+
+    def get_all_association_types(self):
+        self.ensure_loaded()
+        return list(self.association_types.values())
+
+    def get_name_index(self, category = "entity"):
+        """
+        Gets the EdmNameIndex over entity types ("entity"/"association") or property types ("property").
+
+        The index is built once per loaded EDM and reused until the cache is invalidated.
+        """
+
+        kind = "entity" if category in ["entity", "association"] else "property"
+        self.ensure_loaded()
+        with self._lock:
+            if kind not in self._name_indices:
+                pool = self.entity_types if kind == "entity" else self.property_types
+                self._name_indices[kind] = EdmNameIndex(pool.values())
+            return self._name_indices[kind]
+
+
+class EdmNameIndex(object):
+    """
+    Indexes a pool of EDM types by lowercase name and by fqn trigrams.
+
+    Deprecated types (with "-d" in their name, title or description) are left out, as in deduce_edm_object.
+    """
+
+    def __init__(self, pool):
+        self.names = dict()
+        self.fqns = []
+        self._trigrams = dict()
+        for x in pool:
+            if _is_deprecated(x):
+                continue
+            self.names.setdefault(x.type.name.lower(), dict())[x.type.namespace] = x.type.name
+            fqn = misc.get_fqn_string(x.type)
+            for trigram in _get_trigrams(fqn):
+                self._trigrams.setdefault(trigram, []).append(len(self.fqns))
+            self.fqns.append(fqn)
+
+    def lookup(self, name):
+        """
+        Gets the {namespace: name} options for a (case insensitive) type name.
+        """
+
+        return self.names.get(name.lower(), dict())
+
+    def suggest(self, fqn, n = 5, cutoff = 0.4):
+        """
+        Lists up to n fqns that look like the given one, best match first.
+
+        Similarity is the Jaccard index of the sets of character trigrams.
+        """
+
+        trigrams = _get_trigrams(fqn)
+        shared = Counter()
+        for trigram in trigrams:
+            shared.update(self._trigrams.get(trigram, []))
+        scored = []
+        for position, count in shared.items():
+            candidate = self.fqns[position]
+            if candidate == fqn:
+                continue
+            score = count / (len(trigrams) + len(_get_trigrams(candidate)) - count)
+            if score >= cutoff:
+                scored.append((score, candidate))
+        return [candidate for score, candidate in sorted(scored, key = lambda pair: (-pair[0], pair[1]))[:n]]
+
+
+class EntitySetCache(object):
+    """
+    A caching stand-in for openlattice.EntitySetsApi
+
+    get_all_entity_sets is called at most once. Once it has been, entity set lookups by name and id
+    are answered from an index; before that they are passed through to the API and remembered.
+    The names are also indexed by entity type (sorted), for get_prefix_matches.
+    Without an entity_sets_api (offline mode), the entity sets have to be provided with index().
+    """
+
+    def __init__(self, entity_sets_api = None):
+        self.entity_sets_api = entity_sets_api
+        self._lock = threading.RLock()
+        self.invalidate()
+
+    def __getattr__(self, name):
+        entity_sets_api = self.__dict__.get("entity_sets_api")
+        if name.startswith("_") or entity_sets_api is None:
+            raise AttributeError(name)
+        attribute = getattr(entity_sets_api, name)
+        if callable(attribute) and not name.startswith("get_"):
+            def passthrough(*args, **kwargs):
+                clean.report.count("api_calls")
+                try:
+                    return attribute(*args, **kwargs)
+                finally:
+                    self.invalidate()
+            return passthrough
+        return attribute
+
+    def invalidate(self):
+        """
+        Drops everything that was cached.
+        """
+
+        with self._lock:
+            self.loaded = False
+            self.entity_sets = dict()
+            self.entity_set_ids = dict()
+            self.entity_set_names_by_type = dict()
+            self._fingerprint = None
+
+    def index(self, entity_sets = []):
+        """
+        Replaces the cached entity sets with the given list.
+        """
+
+        with self._lock:
+            self.invalidate()
+            for entity_set in entity_sets:
+                self.entity_sets[entity_set.id] = entity_set
+                self.entity_set_ids[entity_set.name] = entity_set.id
+                self.entity_set_names_by_type.setdefault(entity_set.entity_type_id, []).append(entity_set.name)
+            for names in self.entity_set_names_by_type.values():
+                names.sort()
+            self.loaded = True
+
+    def get_all_entity_sets(self):
+        if not self.loaded:
+            clean.report.count("cache_misses")
+            with self._lock:
+                if not self.loaded:
+                    if self.entity_sets_api is None:
+                        raise ValueError("Can't load entity sets without an entity_sets_api.")
+                    clean.report.count("api_calls")
+                    self.index(self.entity_sets_api.get_all_entity_sets())
+        else:
+            clean.report.count("cache_hits")
+        return list(self.entity_sets.values())
+
+    def get_prefix_matches(self, entity_set_name, entity_type_id, min_length = 3):
+        """
+        Finds the entity sets of an entity type whose names share a prefix of at least min_length
+        characters with entity_set_name.
+
+        :return: list of (length of the shared prefix, entity set name)
+        """
+
+        self.get_all_entity_sets()
+        names = self.entity_set_names_by_type.get(entity_type_id, [])
+        prefix = entity_set_name[:min_length]
+        if len(prefix) < min_length:
+            return []
+        out = []
+        for name in names[bisect.bisect_left(names, prefix):]:
+            if not name.startswith(prefix):
+                break
+            count = min_length
+            while count < min(len(name), len(entity_set_name)) and name[count] == entity_set_name[count]:
+                count += 1
+            out.append((count, name))
+        return out
+
+    def get_fingerprint(self):
+        """
+        Gets a hash of the names and entity types of all entity sets, which changes whenever an entity set
+        is added, renamed or retyped. Returns None if the entity sets haven't been loaded in bulk.
+        """
+
+        if not self.loaded:
+            return None
+        with self._lock:
+            if self._fingerprint is None:
+                entity_sets = sorted((str(x.name), str(x.entity_type_id)) for x in self.entity_sets.values())
+                self._fingerprint = hashlib.sha256(json.dumps(entity_sets).encode("utf-8")).hexdigest()
+            return self._fingerprint
+
+    def get_entity_set_id(self, entity_set_name):
+        if entity_set_name not in self.entity_set_ids:
+            clean.report.count("cache_misses")
+            if self.loaded or self.entity_sets_api is None:
+                raise _not_found("entity set", entity_set_name)
+            clean.report.count("api_calls")
+            entity_set_id = self.entity_sets_api.get_entity_set_id(entity_set_name)
+            with self._lock:
+                self.entity_set_ids[entity_set_name] = entity_set_id
+        else:
+            clean.report.count("cache_hits")
+        return self.entity_set_ids[entity_set_name]
+
+    def get_entity_set(self, entity_set_id):
+        if entity_set_id not in self.entity_sets:
+            clean.report.count("cache_misses")
+            if self.loaded or self.entity_sets_api is None:
+                raise _not_found("entity set", entity_set_id)
+            clean.report.count("api_calls")
+            entity_set = self.entity_sets_api.get_entity_set(entity_set_id)
+            with self._lock:
+                self.entity_sets[entity_set_id] = entity_set
+        else:
+            clean.report.count("cache_hits")
+        return self.entity_sets[entity_set_id]
+
+
+def write_snapshot_file(filename, edm_api, entity_sets_api = None):
+    """
+    Exports the EDM (and optionally all entity sets) to a json file.
+
+    The file can be passed to Flight(edm_snapshot = filename) to validate flights offline.
+    """
+
+    if not isinstance(edm_api, EdmCache):
+        edm_api = EdmCache(edm_api)
+    # loading sets the version, so it has to happen before the version is read
+    edm_api.ensure_loaded()
+    snapshot = {
+        "version": edm_api.version,
+        "propertyTypes": _to_dicts(edm_api.get_all_property_types()),
+        "entityTypes": _to_dicts(edm_api.get_all_entity_types()),
+        "associationTypes": _to_dicts(edm_api.get_all_association_types()),
+        "entitySets": _to_dicts(entity_sets_api.get_all_entity_sets()) if entity_sets_api is not None else []
+    }
+    with open(filename, "w") as fl:
+        json.dump(snapshot, fl)
+
+
+def read_snapshot_file(filename):
+    """
+    Reads a json file written by write_snapshot_file.
+
+    :return: (EdmCache, EntitySetCache) that answer all lookups without network access
+    """
+
+    with open(filename, "r") as fl:
+        snapshot = json.load(fl)
+    edm_cache = EdmCache()
+    edm_cache.index(
+        property_types = _from_dicts(snapshot["propertyTypes"], "list[PropertyType]"),
+        entity_types = _from_dicts(snapshot["entityTypes"], "list[EntityType]"),
+        association_types = _from_dicts(snapshot["associationTypes"], "list[AssociationType]")
+    )
+    edm_cache.version = snapshot.get("version")
+    entity_set_cache = EntitySetCache()
+    entity_set_cache.index(_from_dicts(snapshot.get("entitySets", []), "list[EntitySet]"))
+    return edm_cache, entity_set_cache
+
+
+# shared caches, least recently used first; a process refreshing its token would otherwise keep one EDM per token
+_shared_caches = OrderedDict()
+_shared_lock = threading.Lock()
+MAX_SHARED_CACHES = 4
+
+
+def get_shared_edm_cache(edm_api, snapshot_path = DEFAULT_SNAPSHOT_PATH, ttl = DEFAULT_TTL):
+    """
+    Gets the process-wide EdmCache for the host and access token of the given EdmApi, creating it if needed.
+
+    Caches are kept per token, so a flight never reads or writes through another configuration's credentials,
+    and a refreshed token gets a cache of its own. Only the MAX_SHARED_CACHES most recently used caches are kept.
+    The defaults for snapshot_path and ttl can be set with the OLPY_EDM_SNAPSHOT and OLPY_EDM_TTL
+    environment variables, so scheduled processes get warm starts without code changes.
+    """
+
+    configuration = edm_api.api_client.configuration
+    key = (configuration.host, getattr(configuration, "access_token", None))
+    with _shared_lock:
+        if key not in _shared_caches:
+            _shared_caches[key] = EdmCache(edm_api, snapshot_path = snapshot_path, ttl = ttl)
+            while len(_shared_caches) > MAX_SHARED_CACHES:
+                _shared_caches.popitem(last = False)
+        _shared_caches.move_to_end(key)
+        return _shared_caches[key]
+
+
+def _not_found(description, key):
+    return openlattice.rest.ApiException(
+        status = 404,
+        reason = f"The {description} {key} is not in the EDM."
+    )
+
+
+def _is_deprecated(edm_type):
+    return any("-d" in (text or "").lower() for text in [edm_type.type.name, edm_type.description, edm_type.title])
+
+
+def _get_trigrams(string):
+    padded = "  " + string.lower() + " "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _create_snapshot_table(connection):
+    connection.execute("""
+        CREATE TABLE IF NOT EXISTS edm_snapshot (
+            host TEXT PRIMARY KEY,
+            version TEXT,
+            fetched_at REAL,
+            property_types TEXT,
+            entity_types TEXT,
+            association_types TEXT
+        )""")
+
+
+class _JsonPayload(object):
+    """
+    Mimics the REST response object that ApiClient.deserialize expects.
+    """
+
+    def __init__(self, data):
+        self.data = data
+
+
+def _to_dicts(objects):
+    return openlattice.ApiClient().sanitize_for_serialization(objects)
+
+
+def _from_dicts(dicts, response_type):
+    return _from_json(json.dumps(dicts), response_type)
+
+
+def _to_json(objects):
+    return json.dumps(_to_dicts(objects))
+
+
+def _from_json(string, response_type):
+    return openlattice.ApiClient().deserialize(_JsonPayload(string), response_type)
@@ -1,19 +1,113 @@
 import openlattice
 import yaml
 import re
+import io
+import os
+import pickle
+import hashlib
+import functools
+import weakref
 from .. import clean, constants, misc
+import sqlalchemy as sq
 from sqlalchemy.types import *
 import pandas as pd
 from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from ..clean import atlas, datetimes
+from . import edm, validation
+
+# bumped whenever the layout of compiled flights changes
+_COMPILED_FORMAT = 1
+
+# transforms that parse dates/times with java patterns
+_DATE_TRANSFORMS = {
+    "transforms.DateTimeTransform",
+    "transforms.DateTransform",
+    "transforms.DateTimeAsDateTransform",
+    "transforms.DateAsDateTimeTransform",
+    "transforms.TimeTransform"
+}
+
+# the data checks implied by the parsing transforms, as vectorized checks on non-blank values
+_VALUE_CHECKS = {
+    "transforms.ParseIntTransform": ("integer", clean.utils.parses_as_int),
+    "transforms.ParseDoubleTransform": ("double", clean.utils.parses_as_double),
+    "transforms.ParseBoolTransform": ("boolean", clean.utils.parses_as_bool)
+}
+
+# POSTGRES_TO_OL as rows, to merge against
+_OL_TO_POSTGRES = pd.DataFrame(
+    [(oltype, pstype) for oltype, pstypes in constants.datatypes.POSTGRES_TO_OL.items() for pstype in pstypes],
+    columns = ["ol_data_type", "postgres_data_type"]
+)
+
+
+def validate_flights_against_atlas(flights_and_tables, engine, log_level = "none"):
+    """
+    Validates many flights against their atlas tables, with a single query for the datatypes of all tables.
+
+    :param flights_and_tables: list of (Flight, table name) pairs
+    :param engine: sqlalchemy.Engine
+    :return: list of ValidationReports, in the same order
+    """
+
+    table_names = sorted({table_name for flight, table_name in flights_and_tables if table_name})
+    datatypes = clean.atlas.get_datatypes_for_tables(table_names, engine) if table_names else \
+        pd.DataFrame(columns = ["table_name", "column_name", "data_type"])
+    by_table = {
+        table_name: group.drop(columns = "table_name").set_index("column_name")
+        for table_name, group in datatypes.groupby("table_name")
+    }
+    no_table = datatypes.drop(columns = "table_name").iloc[:0].set_index("column_name")
+    return [
+        flight.validate_flight_against_atlas(
+            table_name = table_name,
+            engine = engine,
+            log_level = log_level,
+            table_datatypes = by_table.get(table_name, no_table)
+        ) for flight, table_name in flights_and_tables
+    ]
+
+
+def _cached_validation(validator):
+    """
+    Serves a definition-level validator from the shared validation cache.
+
+    On a miss, the validator runs without logging and its report is stored; either way, the status
+    of the report and its sub reports is printed according to log_level.
+    """
 
-from ..clean import atlas
+    @functools.wraps(validator)
+    def cached_validator(self, *args, log_level = "none", **kwargs):
+        key = self.get_validation_key(validator.__qualname__)
+        if key is None:
+            return validator(self, *args, log_level = log_level, **kwargs)
+        cache = validation.get_shared_validation_cache()
+        report = cache.get(key)
+        if report is None:
+            report = validator(self, *args, log_level = "none", **kwargs)
+            cache.put(key, report)
+        _print_status_post_order(report, log_level = log_level)
+        return report
+    return cached_validator
 
 
 class PropertyDefinition(object):
     """
     A class representing a property definition
+
+    Assigning type, column or transforms marks the definition as changed, so that derived values
+    (like the schema) are recomputed. In-place edits of the transforms need an explicit mark_dirty().
     """
 
+    _TRACKED_ATTRIBUTES = {"type", "column", "transforms"}
+    _revision = 0
+    _schema = None
+    _schema_revision = None
+    _columns = None
+    _columns_revision = None
+
     def __init__(self, type = "", column = "", transforms = [], definition_dict = dict(), edm_api = None):
         if not isinstance(definition_dict, dict):
             print("Attempting to automatically interpret %s as a property definition..."%str(definition_dict))
@@ -48,6 +142,18 @@ class PropertyDefinition(object):
         self.edm_api = edm_api
         self.property_type = None
 
+    def __setattr__(self, name, value):
+        super().__setattr__(name, value)
+        if name in self._TRACKED_ATTRIBUTES:
+            self.mark_dirty()
+
+    def mark_dirty(self):
+        """
+        Flags this property definition as changed.
+        """
+
+        self._revision += 1
+
     def get_property_type(self):
         """
         Gets the property type ID.
@@ -129,14 +235,18 @@ class PropertyDefinition(object):
         return report
 
 
-    def add_datatype_parser_if_needed(self, timezone = None):
+    def add_datatype_parser_if_needed(self, timezone = None, sample = None, df = None, engine = None, table_name = None, sample_size = 10000):
         """
         Creates a parsing transformation within this property definition if it is needed.
 
-        String formats for times and datetimes are assumed to be in ["HH:mm:ss", "HH:mm:ss.S", "HH:mm:ss.SS", "HH:mm:ss.SSS"] 
+        If source data is available (a sample of the column's values, a DataFrame, or an engine and table name
+        to sample up to sample_size values from), the smallest set of java patterns covering the times and
+        datetimes in the sample is inferred with clean.datetimes.infer_patterns, and date-only patterns get
+        a transform that parses dates (DateTransform or DateAsDateTimeTransform).
+        Otherwise, string formats for times and datetimes are assumed to be in ["HH:mm:ss", "HH:mm:ss.S", "HH:mm:ss.SS", "HH:mm:ss.SSS"]
         and ["yyyy-MM-dd HH:mm:ss", "yyyy-MM-dd HH:mm:ss.S", "yyyy-MM-dd HH:mm:ss.SS", "yyyy-MM-dd HH:mm:ss.SSS"] respectively.
         As such, manually checking the string formats in the source data and updating the flight as needed is a required step
-        following the use of this function.
+        following the use of this function without source data.
         """
 
         datatype = self.get_property_type().datatype
@@ -159,32 +269,80 @@ class PropertyDefinition(object):
                     parse_req[datatype][0]: None
                 }
                 arg_dict = dict()
-                if datatype == "TimeOfDay":
-                    transform["pattern"] = ["HH:mm:ss", "HH:mm:ss.S", "HH:mm:ss.SS", "HH:mm:ss.SSS"]
-                    if timezone is not None:
-                        transform["timezone"] = timezone
-                elif datatype == "Date" or datatype == "DateTimeOffset":
-                    transform["pattern"] = ["yyyy-MM-dd HH:mm:ss", "yyyy-MM-dd HH:mm:ss.S", "yyyy-MM-dd HH:mm:ss.SS", "yyyy-MM-dd HH:mm:ss.SSS"]
+                if datatype in {"TimeOfDay", "Date", "DateTimeOffset"}:
+                    if sample is None:
+                        sample = self._get_sample(df = df, engine = engine, table_name = table_name, sample_size = sample_size)
+                    patterns = []
+                    if sample is not None:
+                        candidates = {
+                            "TimeOfDay": datetimes.TIME_PATTERNS,
+                            "Date": datetimes.DATE_PATTERNS,
+                            "DateTimeOffset": datetimes.DATETIME_PATTERNS
+                        }[datatype]
+                        patterns = datetimes.infer_patterns(pd.Series(sample), candidates)
+                        if not patterns:
+                            print(f"No known pattern matches the values of {self.type}, please add the patterns by hand.")
+                        timed = [pattern for pattern in patterns if datetimes.has_time(pattern)]
+                        if patterns and datatype == "Date" and len(timed) < len(patterns):
+                            # DateTimeAsDateTransform can't read date-only values; DateTransform skips any time fields
+                            transform = {"transforms.DateTransform": None}
+                        elif patterns and datatype == "DateTimeOffset" and not timed:
+                            transform = {"transforms.DateAsDateTimeTransform": None}
+                        elif datatype == "DateTimeOffset" and len(timed) < len(patterns):
+                            print(f"Some values of {self.type} have no time of day, only the patterns with times are used. Please check these values by hand.")
+                            patterns = timed
+                    if patterns:
+                        transform["pattern"] = patterns
+                    elif datatype == "TimeOfDay":
+                        transform["pattern"] = ["HH:mm:ss", "HH:mm:ss.S", "HH:mm:ss.SS", "HH:mm:ss.SSS"]
+                    else:
+                        transform["pattern"] = ["yyyy-MM-dd HH:mm:ss", "yyyy-MM-dd HH:mm:ss.S", "yyyy-MM-dd HH:mm:ss.SS", "yyyy-MM-dd HH:mm:ss.SSS"]
                     if timezone is not None:
                         transform["timezone"] = timezone
                 if self.transforms:
                     self.transforms.append(transform)
+                    self.mark_dirty()
                 else:
                     self.transforms = [transform]
 
+    def _get_sample(self, df = None, engine = None, table_name = None, sample_size = 10000):
+        """
+        Gets up to sample_size non-null values of the column this property reads, or None if there is no
+        single column or no source.
+        """
+
+        columns = self.get_columns()
+        if len(columns) != 1:
+            return None
+        column = columns.pop()
+        if df is not None:
+            return df[column].dropna().head(sample_size) if column in df.columns else None
+        if engine is not None and table_name:
+            return pd.read_sql(
+                sq.text(f'SELECT "{column}" FROM "{table_name}" WHERE "{column}" IS NOT NULL LIMIT :limit'),
+                engine,
+                params = {"limit": sample_size}
+            )[column]
+        return None
+
     def get_schema(self):
         """
         Gets the schema of this property definition.
 
-        Called by the enclosing EntityDefinition's get_schema()
+        Called by the enclosing EntityDefinition's get_schema(). The schema is only re-derived if the
+        definition changed since the last call.
         """
 
+        if self._schema is not None and self._schema_revision == self._revision:
+            return self._schema
         out = {
             "fqn": self.type,
             "column": self.column
             }
         if isinstance(self.transforms, list):
             out['transforms'] = _parse_transforms(self.transforms)
+        self._schema = out
+        self._schema_revision = self._revision
         return out
 
     def get_columns(self):
@@ -193,13 +351,24 @@ class PropertyDefinition(object):
 
         The recursive logic used by this function includes string matching heuristics that
         may not be stable against changes in flight syntax specifications.
+        The result is cached until the definition changes.
+        """
+
+        if self._columns is None or self._columns_revision != self._revision:
+            schema = self.get_schema()
+            columns = {schema['column']} if schema['column'] else set()
+            if 'transforms' in schema.keys():
+                columns = columns | set(schema['transforms']['columns'])
+            self._columns = frozenset(columns)
+            self._columns_revision = self._revision
+        return set(self._columns)
+
+    def get_definition_dict(self):
+        """
+        Gets the dictionary this property definition can be re-created from.
         """
 
-        schema = self.get_schema()
-        columns = {schema['column']} if schema['column'] else set()
-        if 'transforms' in schema.keys():
-            columns = columns | set(schema['transforms']['columns'])
-        return columns
+        return {"type": self.type, "column": self.column, "transforms": self.transforms}
 
     def delete_column(self, column):
         """
@@ -210,14 +379,26 @@ class PropertyDefinition(object):
 
         if self.column:
             return self.column == column
+        self.mark_dirty()
         return _delete_column_from_object(self.transforms, column)
 
 
 class EntityDefinition(object):
     """
     A class representing an entity definition
+
+    Like PropertyDefinition, assigning one of the tracked attributes marks the definition as changed,
+    along with the flights it belongs to.
+    Changes to the property definitions (added, removed or changed themselves) are picked up by get_revision().
     """
 
+    _TRACKED_ATTRIBUTES = {"name", "fqn", "entity_set_name", "conditions", "update_type", "property_definitions"}
+    _revision = 0
+    _schema = None
+    _schema_revision = None
+    _columns = None
+    _columns_revision = None
+
     def __init__(self, definition_dict = dict(), edm_api = None, entity_sets_api = None):
         self.name = definition_dict['name'] if 'name' in definition_dict.keys() else ""
         self.fqn = definition_dict['fqn'] if 'fqn' in definition_dict.keys() else ""
@@ -229,6 +410,7 @@ class EntityDefinition(object):
         self.entity_sets_api = entity_sets_api
 
         self.entity_type = None
+        self.key_property_types = None
         
         # deserialize and check property definitions
         self.property_definitions = {}
@@ -236,6 +418,32 @@ class EntityDefinition(object):
             for key, defn in definition_dict['propertyDefinitions'].items(): #todo double check removing automatic key-to-type doesn't break anything
                 self.property_definitions[key] = PropertyDefinition(definition_dict = defn, edm_api = edm_api)
 
+    def __setattr__(self, name, value):
+        super().__setattr__(name, value)
+        if name in self._TRACKED_ATTRIBUTES:
+            self.mark_dirty()
+
+    def mark_dirty(self):
+        """
+        Flags this entity definition (and the flights containing it) as changed. Needed after editing the conditions in place.
+        """
+
+        self._revision += 1
+        for flight in list(self._get_flights()):
+            flight.mark_dirty()
+
+    def _get_flights(self):
+        if "_flights" not in self.__dict__:
+            object.__setattr__(self, "_flights", weakref.WeakSet())
+        return self._flights
+
+    def get_revision(self):
+        """
+        Gets a value that changes whenever this definition or one of its property definitions changes.
+        """
+
+        return (self._revision, tuple((alias, defn, defn._revision) for alias, defn in self.property_definitions.items()))
+
     def get_entity_type(self):
         """
         Gets the entity type.
@@ -245,6 +453,27 @@ class EntityDefinition(object):
             self.load_entity_type()
         return self.entity_type
 
+    def get_validation_key(self, check):
+        """
+        Gets the key under which the report of a check on this definition is cached.
+
+        The key combines the check, the content of the definition and the EDM version (and for entity
+        set validation, the fingerprint of the entity sets). Returns None if the EDM version isn't
+        known, in which case the report isn't cached.
+        """
+
+        if isinstance(self.edm_api, edm.EdmCache):
+            self.edm_api.ensure_loaded()
+        version = getattr(self.edm_api, "version", None)
+        if not version:
+            return None
+        entity_sets = None
+        if check.endswith("entity_set_validation"):
+            entity_sets = self.entity_sets_api.get_fingerprint() if isinstance(self.entity_sets_api, edm.EntitySetCache) else None
+            if entity_sets is None:
+                return None
+        return validation.get_key(check, type(self).__name__, self.get_definition_dict(), version, entity_sets)
+
     def load_entity_type(self):
         """
         Calls the API and loads the entity type information into an instance variable.
@@ -264,6 +493,18 @@ class EntityDefinition(object):
                 properties=[]
             )
 
+    def get_key_property_types(self):
+        """
+        Gets the property types making up the primary key of this entity type.
+        :return: list of openlattice.PropertyType
+        """
+
+        if self.key_property_types is None:
+            entity_type = self.get_entity_type()
+            keys = entity_type.key if entity_type and entity_type.key else []
+            self.key_property_types = [self.edm_api.get_property_type(p) for p in keys]
+        return self.key_property_types
+
     def add_and_check_edm(self):
         """
         Checks that this instance's property types are included in the EDM for this entity type.
@@ -288,6 +529,8 @@ class EntityDefinition(object):
             validated = True
         )
 
+    @clean.report.instrumented
+    @_cached_validation
     def parsers_validation(self, log_level = "none"):
         report = clean.report.ValidationReport(
             title = f"Parsers Validation for Entity Definition {self.name}"
@@ -307,6 +550,8 @@ class EntityDefinition(object):
         report.print_status(log_level = log_level)
         return report
 
+    @clean.report.instrumented
+    @_cached_validation
     def entity_set_validation(self, all_entity_sets = [], already_done = dict(), log_level = "none"):
         report = clean.report.ValidationReport(
             title = f"Entity Set Validation for Entity {self.name}"
@@ -330,18 +575,11 @@ class EntityDefinition(object):
             report.issues.append(f"The entity set {self.entity_set_name} doesn't exist.")
 
         if not report.validated:
-            if not all_entity_sets:
-                all_entity_sets += self.entity_sets_api.get_all_entity_sets()
-            possible_overlap = []
-            for entity_set in all_entity_sets:
-                if entity_set.entity_type_id == self.get_entity_type().id:
-                    count = 0
-                    for a, b in zip(list(self.entity_set_name), list(entity_set.name)):
-                        if a != b:
-                            break
-                        count+=1
-                    if count >= 3:
-                        possible_overlap.append((count, entity_set.name))
+            entity_sets = self.entity_sets_api
+            if not isinstance(entity_sets, edm.EntitySetCache):
+                entity_sets = edm.EntitySetCache()
+                entity_sets.index(all_entity_sets or self.entity_sets_api.get_all_entity_sets())
+            possible_overlap = entity_sets.get_prefix_matches(self.entity_set_name, self.get_entity_type().id)
             if len(possible_overlap) > 0:
                 overlaps = ", ".join([b for a, b in sorted(possible_overlap, reverse = True)])
                 report.issues[-1] += f" Did you mean any of these: {overlaps}"
@@ -354,6 +592,8 @@ class EntityDefinition(object):
         already_done[(self.fqn, self.entity_set_name)] = report
         return report
         
+    @clean.report.instrumented
+    @_cached_validation
     def necessary_components_validation(self, log_level = "none"):
         report = clean.report.ValidationReport(
             title = f"Necessary Components Validation for Entity {self.name}"
@@ -388,6 +628,8 @@ class EntityDefinition(object):
         report.print_status(log_level = log_level)
         return report
 
+    @clean.report.instrumented
+    @_cached_validation
     def fqn_validation(self, log_level = "none"):
         report = clean.report.ValidationReport(
             title = f"FQN Validation for Entity {self.name}"
@@ -401,12 +643,13 @@ class EntityDefinition(object):
 
         if not entity_type.key:
             report.validated = False
-            report.issues.append(f"Entity type {self.fqn} doesn't exist.")
+            report.issues.append(f"Entity type {self.fqn} doesn't exist." + _get_suggestions_string(self.edm_api, self.fqn, "entity"))
 
         for x in self.property_definitions.values():
             if not x.get_property_type() or x.get_property_type().id not in entity_type.properties:
                 report.validated = False
-                report.issues.append(f"Property type {x.type} is currently not in entity type {self.fqn}")
+                suggestions = "" if x.get_property_type() and x.get_property_type().id else _get_suggestions_string(self.edm_api, x.type, "property")
+                report.issues.append(f"Property type {x.type} is currently not in entity type {self.fqn}" + suggestions)
         report.print_status(log_level = log_level)
         return report
 
@@ -424,9 +667,8 @@ class EntityDefinition(object):
             columns = self.get_columns()
         columns = list(columns)
         keys = {"ol.id"}
-        pk_type_ids = self.get_entity_type().key
-        if pk_type_ids:
-            key_types = [self.edm_api.get_property_type(p) for p in pk_type_ids]
+        key_types = self.get_key_property_types()
+        if key_types:
             keys = set(["%s.%s"%(pk_type.type.namespace, pk_type.type.name) for pk_type in key_types])
 
         these = set(self.property_definitions.keys())
@@ -474,26 +716,25 @@ class EntityDefinition(object):
 
     def sort_properties_for_writing(self):
         """
-        Lists the property definitions with the primary key first, if it exists.
+        Lists the property definitions in the order they were defined.
+
+        This makes no EDM lookups, so serializing a flight stays offline.
         """
 
-        try:
-            ent_type = self.edm_api.get_entity_type(self.entity_type_id)
-            key_types = [self.edm_api.get_property_type(x) for x in ent_type.key]
-            pks = set(["%s.%s"%(x.type.namespace, x.type.name) for x in key_types])
-            these_props = self.property_definitions.items()
-            for prop in these_props:
-                if prop[0] in pks or prop[1].type in pks:
-                    return [prop] + [x for x in these_props if x[0] != prop[0]]
-        except:
-            return list(self.property_definitions.items())
+        return list(self.property_definitions.items())
 
 
     def get_schema(self):
         """
         Gets the schema.
+
+        Only re-derived if the definition changed since the last call; unchanged property
+        definitions reuse their own cached schema.
         """
 
+        revision = self.get_revision()
+        if self._schema is not None and self._schema_revision == revision:
+            return self._schema
         out = {
             "fqn": self.fqn,
             "entity_set_name": self.entity_set_name,
@@ -502,6 +743,8 @@ class EntityDefinition(object):
         }
         if isinstance(self.conditions, list):
             out['conditions'] = _parse_conditions(self.conditions)
+        self._schema = out
+        self._schema_revision = revision
         return out
 
     def get_columns(self):
@@ -510,12 +753,17 @@ class EntityDefinition(object):
 
         The recursive logic used by this function includes string matching heuristics that
         may not be stable against changes in flight syntax specifications.
+        The result is cached until the definition changes.
         """
 
-        cols = set()
-        for property in self.property_definitions.values():
-            cols = cols.union(property.get_columns())
-        return set(cols)
+        revision = self.get_revision()
+        if self._columns is None or self._columns_revision != revision:
+            cols = set()
+            for property in self.property_definitions.values():
+                cols = cols.union(property.get_columns())
+            self._columns = frozenset(cols)
+            self._columns_revision = revision
+        return set(self._columns)
 
     def get_columns_from_pk(self):
         """
@@ -534,6 +782,20 @@ class EntityDefinition(object):
                 if property.type == "ol.id":
                     return property.get_columns()
 
+    def get_definition_dict(self):
+        """
+        Gets the dictionary this entity definition can be re-created from.
+        """
+
+        return {
+            "name": self.name,
+            "fqn": self.fqn,
+            "entitySetName": self.entity_set_name,
+            "conditions": self.conditions,
+            "updateType": self.update_type,
+            "propertyDefinitions": {key: defn.get_definition_dict() for key, defn in self.property_definitions.items()}
+        }
+
     def delete_column(self, column):
         """
         Delete all references to a specific column in this entity definition
@@ -548,6 +810,7 @@ class EntityDefinition(object):
         for key in keys_to_delete:
             del self.property_definitions[key]
         _delete_column_from_object(self.conditions, column)
+        self.mark_dirty()
 
         # consider deletable if primary key definition is gone
         keys = self.get_entity_type().key
@@ -568,6 +831,8 @@ class AssociationDefinition(EntityDefinition):
     An AssociationDefinition is an EntityDefinition with a defined source and destination.
     """
 
+    _TRACKED_ATTRIBUTES = EntityDefinition._TRACKED_ATTRIBUTES | {"src_alias", "dst_alias"}
+
     def __init__(self, definition_dict = dict(), src_alias = "", dst_alias = "", edm_api = None, entity_sets_api = None):
         super().__init__(definition_dict = definition_dict, edm_api = edm_api, entity_sets_api = entity_sets_api)
         #src and dst are EntityDefinitions unless they aren't defined in the flight, in which case they are set to the src and dst strings given in the definition_dict.
@@ -616,6 +881,8 @@ class AssociationDefinition(EntityDefinition):
             )
         self.entity_type = self.association_type.entity_type
 
+    @clean.report.instrumented
+    @_cached_validation
     def necessary_components_validation(self, log_level = "none"):
         """
         Check association has all necessary components defined.
@@ -649,7 +916,19 @@ class AssociationDefinition(EntityDefinition):
         Gets the schema.
         """
 
-        out = super().get_schema()
+        out = dict(super().get_schema())
+        out.update({
+            "src": self.src_alias,
+            "dst": self.dst_alias
+        })
+        return out
+
+    def get_definition_dict(self):
+        """
+        Gets the dictionary this association definition can be re-created from.
+        """
+
+        out = super().get_definition_dict()
         out.update({
             "src": self.src_alias,
             "dst": self.dst_alias
@@ -662,19 +941,37 @@ class Flight(object):
     A class representing a flight script
     """
 
-    def __init__(self, name = "", organization_id = None, configuration=None, path = None):
+    _revision = 0
+    _column_index = None
+    _column_index_revision = None
+    _graph_index = None
+    _graph_index_revision = None
+
+    def __init__(self, name = "", organization_id = None, configuration=None, path = None, edm_cache = None, edm_snapshot = None):
+        """
+        If edm_snapshot (a file written by edm.write_snapshot_file) is given, the flight runs offline:
+        all EDM and entity set lookups are answered from the snapshot and no configuration is needed.
+        """
 
         self.name = name
         self.entity_definitions = dict()
         self.association_definitions = dict()
-        if not configuration:
-            self.configuration = misc.get_config()
-        else:
+        self.organization_id = organization_id
+
+        if edm_snapshot:
             self.configuration = configuration
+            self.edm_api, self.entity_sets_api = edm.read_snapshot_file(edm_snapshot)
+        else:
+            if not configuration:
+                self.configuration = misc.get_config()
+            else:
+                self.configuration = configuration
 
-        self.organization_id = organization_id
-        self.edm_api = openlattice.EdmApi(openlattice.ApiClient(self.configuration))
-        self.entity_sets_api = openlattice.EntitySetsApi(openlattice.ApiClient(self.configuration))
+            # all definitions share one bulk-loaded EDM cache (per process and host, unless one is passed)
+            if edm_cache is None:
+                edm_cache = edm.get_shared_edm_cache(openlattice.EdmApi(openlattice.ApiClient(self.configuration)))
+            self.edm_api = edm_cache
+            self.entity_sets_api = edm.EntitySetCache(openlattice.EntitySetsApi(openlattice.ApiClient(self.configuration)))
         if path:
             self.deserialize(path)
 
@@ -683,58 +980,70 @@ class Flight(object):
         """
         A function that produces a string representation of the flight
 
+        See serialize for the conventions that are upheld.
+        """
+
+        out = io.StringIO()
+        self.serialize(out)
+        return out.getvalue()
+
+    def serialize(self, fp):
+        """
+        Writes the flight as yaml to a file handle (or io.StringIO)
+
         The following conventions are upheld:
         - Two-space indentation
         - Entity definitions are written before association definitions.
         - Entities that are more connected appear earlier.
-        - Primary keys appear ahead of property definitions.
+        - Property definitions appear in the order they were defined.
         - Association definitions are grouped by fqn and sorted by the alias's trailing integer.
         """
 
-        out_string = "organizationId: {organization_id}\n".format(organization_id = self.organization_id)
+        write = _EscapingWriter(fp).write
+        write("organizationId: {organization_id}\n".format(organization_id = self.organization_id))
         depth = 2
         for def_type in ['entityDefinitions', 'associationDefinitions']:
             sorted_ent_defs = self._sort_entities_for_writing("entity" if def_type == "entityDefinitions" else "association")
             if len(sorted_ent_defs) == 0:
-                out_string += def_type + ': {}'
+                write(def_type + ': {}')
                 continue
-            out_string += def_type + ':\n'
+            write(def_type + ':\n')
             for alias, entity in sorted_ent_defs:
-                out_string += " " * depth + alias + ":\n"
+                write(" " * depth + alias + ":\n")
                 depth += 2
-                out_string += " " * depth + 'fqn: "' + entity.fqn + '"\n'
-                out_string += " " * depth + 'entitySetName: "' + entity.entity_set_name + '"\n'
+                write(" " * depth + 'fqn: "' + entity.fqn + '"\n')
+                write(" " * depth + 'entitySetName: "' + entity.entity_set_name + '"\n')
                 if len(entity.update_type) > 0:
-                    out_string += " " * depth + 'updateType: "' + entity.update_type + '"\n'
+                    write(" " * depth + 'updateType: "' + entity.update_type + '"\n')
                 if def_type == 'associationDefinitions':
-                    out_string += " " * depth + 'src: "' + entity.src_alias + '"\n'
-                    out_string += " " * depth + 'dst: "' + entity.dst_alias + '"\n'
-                out_string += " " * depth + 'propertyDefinitions:\n'
+                    write(" " * depth + 'src: "' + entity.src_alias + '"\n')
+                    write(" " * depth + 'dst: "' + entity.dst_alias + '"\n')
+                write(" " * depth + 'propertyDefinitions:\n')
                 depth += 2
                 sorted_prop_defs = entity.sort_properties_for_writing()
                 for prop_alias, prop_defn in sorted_prop_defs:
-                    out_string += " " * depth + prop_alias + ':\n'
+                    write(" " * depth + prop_alias + ':\n')
                     depth += 2
-                    out_string += " " * depth + 'type: "' + prop_defn.type + '"\n'
+                    write(" " * depth + 'type: "' + prop_defn.type + '"\n')
                     if prop_defn.column:
-                        out_string += " " * depth + 'column: "' + prop_defn.column + '"\n'
+                        write(" " * depth + 'column: "' + prop_defn.column + '"\n')
                     if prop_defn.transforms:
-                        out_string += " " * depth + 'transforms:\n'
-                        out_string += _write_trans_conds_list(prop_defn.transforms, "transforms", depth)
+                        write(" " * depth + 'transforms:\n')
+                        _write_trans_conds_list(write, prop_defn.transforms, "transforms", depth)
                     depth -= 2
                 depth -= 2
                 if entity.conditions:
-                    out_string += " " * depth + 'conditions:\n'
-                    out_string += _write_trans_conds_list(entity.conditions, "conditions", depth)
-                out_string += " " * depth + 'name: "' + entity.name + '"\n\n'
+                    write(" " * depth + 'conditions:\n')
+                    _write_trans_conds_list(write, entity.conditions, "conditions", depth)
+                write(" " * depth + 'name: "' + entity.name + '"\n\n')
                 depth -=2
-        return out_string.replace('\\', "\\\\")
 
     def _sort_entities_for_writing(self, def_type = 'entity'):
         if def_type == 'entity':
             # sort entities by how well-associated they are
+            index = self.get_graph_index()
             return sorted(self.entity_definitions.items(),
-                         key = lambda pair: sum([1 for x in self.association_definitions.values() if {x.src_alias, x.dst_alias}.intersection({pair[0], pair[1].name})]),
+                         key = lambda pair: len(index.get_associations(pair[0], pair[1].name)),
                          reverse = True)
         else:
             # bunch associations by fqn, sorting by trailing integer in the alias
@@ -744,25 +1053,133 @@ class Flight(object):
                 out += sorted([x for x in self.association_definitions.items() if x[1].fqn == fqn], key = lambda pair: int("0" + re.search("[0-9]*$", pair[0]).group()))
             return out
 
-    def deserialize(self, filename, organization_id=None):
+    def deserialize(self, filename, organization_id=None, compiled_dir = None):
         """
         Populates this flight's entity and association definitions with a deserialized yaml file
+
+        If compiled_dir is given, the flight is compiled into that directory on first load and read
+        back from the compiled artifact afterwards. Artifacts are keyed by the hash of the flight file
+        and the EDM version, so editing the flight or changing the EDM leads to a recompile.
         """
 
         string = open(filename).read()
+        if compiled_dir:
+            compiled_path = self._get_compiled_path(compiled_dir, string, organization_id)
+            if os.path.exists(compiled_path):
+                self.deserialize_compiled(compiled_path)
+                return
         self.deserialize_from_string(string, organization_id)
+        if compiled_dir:
+            os.makedirs(compiled_dir, exist_ok = True)
+            self.compile(compiled_path)
+
+    def _get_compiled_path(self, compiled_dir, string, organization_id):
+        version = None
+        if isinstance(self.edm_api, edm.EdmCache):
+            version = self.edm_api.get_version()
+        digest = hashlib.sha256((string + str(organization_id)).encode("utf-8")).hexdigest()
+        return os.path.join(compiled_dir, f"{digest}-{version or 'unversioned'}.olflight")
+
+    def compile(self, filename):
+        """
+        Writes this flight to a compiled (pickled) artifact that deserialize_compiled reads back.
+
+        Besides the definitions, the artifact holds the resolved EDM types, key property types,
+        schemas and column sets, so loading it skips yaml parsing and all EDM lookups.
+        Only load artifacts you wrote yourself: unpickling runs arbitrary code.
+        """
+
+        self.prefetch_edm()
+        definitions = []
+        entity_types = []
+        association_types = []
+        key_property_types = []
+        property_types = []
+        for kind, defns in [("entity", self.entity_definitions), ("association", self.association_definitions)]:
+            for alias, defn in defns.items():
+                definitions.append({
+                    "kind": kind,
+                    "alias": alias,
+                    "definition": defn.get_definition_dict(),
+                    "schema": defn.get_schema(),
+                    "columns": [prop.get_columns() for prop in defn.property_definitions.values()],
+                    "key_count": None if defn.key_property_types is None else len(defn.key_property_types)
+                })
+                if kind == "entity":
+                    entity_types.append(defn.entity_type)
+                else:
+                    association_types.append(defn.association_type)
+                key_property_types += defn.key_property_types or []
+                property_types += [prop.property_type for prop in defn.property_definitions.values()]
+
+        payload = {
+            "format": _COMPILED_FORMAT,
+            "edm_version": getattr(self.edm_api, "version", None),
+            "organization_id": self.organization_id,
+            "definitions": definitions,
+            "entity_types": edm._to_dicts(entity_types),
+            "association_types": edm._to_dicts(association_types),
+            "key_property_types": edm._to_dicts(key_property_types),
+            "property_types": edm._to_dicts(property_types)
+        }
+        with open(filename, "wb") as fl:
+            pickle.dump(payload, fl, protocol = pickle.HIGHEST_PROTOCOL)
+
+    def deserialize_compiled(self, filename):
+        """
+        Populates this flight's entity and association definitions from an artifact written by compile
+        """
+
+        with open(filename, "rb") as fl:
+            payload = pickle.load(fl)
+        if payload.get("format") != _COMPILED_FORMAT:
+            raise ValueError(f"{filename} was compiled by an incompatible version of olpy, please recompile it.")
+        version = getattr(self.edm_api, "version", None)
+        if version and payload["edm_version"] and version != payload["edm_version"]:
+            print(f"Warning: {filename} was compiled against EDM version {payload['edm_version']}, the current version is {version}.")
+
+        # every kind of EDM object is deserialized in one go
+        entity_types = iter(edm._from_dicts(payload["entity_types"], "list[EntityType]"))
+        association_types = iter(edm._from_dicts(payload["association_types"], "list[AssociationType]"))
+        key_property_types = iter(edm._from_dicts(payload["key_property_types"], "list[PropertyType]"))
+        property_types = iter(edm._from_dicts(payload["property_types"], "list[PropertyType]"))
+
+        self.organization_id = payload["organization_id"]
+        for record in payload["definitions"]:
+            if record["kind"] == "entity":
+                defn = EntityDefinition(
+                    definition_dict = record["definition"],
+                    edm_api = self.edm_api,
+                    entity_sets_api = self.entity_sets_api
+                )
+                defn.entity_type = next(entity_types)
+                self.entity_definitions[record["alias"]] = defn
+            else:
+                defn = AssociationDefinition(
+                    definition_dict = record["definition"],
+                    edm_api = self.edm_api,
+                    entity_sets_api = self.entity_sets_api
+                )
+                defn.association_type = next(association_types)
+                defn.entity_type = defn.association_type.entity_type if defn.association_type else None
+                self.association_definitions[record["alias"]] = defn
+            if record["key_count"] is not None:
+                defn.key_property_types = [next(key_property_types) for i in range(record["key_count"])]
+            for prop, prop_schema, columns in zip(defn.property_definitions.values(), record["schema"]["properties"], record["columns"]):
+                prop.property_type = next(property_types)
+                prop._schema, prop._schema_revision = prop_schema, prop._revision
+                prop._columns, prop._columns_revision = frozenset(columns), prop._revision
+            defn._schema, defn._schema_revision = record["schema"], defn.get_revision()
+
+        self.refresh_schema()
+        print("Finished deserializing the flight!")
 
     def deserialize_from_string(self, string, organization_id):
         """
         Populates this flight's entity and association definitions with a deserialized dictionary string
         """
         
-        reformat = "\n".join(string.split("\n"))
-        reformat = reformat.replace("!<generators.TransformSeriesGenerator>","")
-        reformat = reformat.replace("- !<","- ")
-        reformat = reformat.replace(">",":")
-
-        flight_dict = yaml.load(reformat, Loader=yaml.FullLoader)
+        flight_dict = _load_flight_dict(string)
         if 'organizationId' in flight_dict.keys():
             self.organization_id = flight_dict['organizationId']
         elif organization_id is not None:
@@ -789,6 +1206,45 @@ class Flight(object):
         self.refresh_schema()
         print("Finished deserializing the flight!")
 
+    def prefetch_edm(self, max_workers = 8):
+        """
+        Resolves all EDM objects used in this flight concurrently and stores them on the definitions.
+
+        Every distinct entity/association fqn and property fqn is looked up once on a thread pool,
+        followed by the key property types of every entity type. Afterwards, validation and
+        fill_in find everything they need in the property_type, entity_type, association_type
+        and key_property_types slots.
+        """
+
+        if isinstance(self.edm_api, edm.EdmCache):
+            self.edm_api.ensure_loaded()
+
+        definitions = list(self.entity_definitions.values()) + list(self.association_definitions.values())
+        entity_groups = dict()
+        property_groups = dict()
+        for defn in definitions:
+            entity_groups.setdefault((isinstance(defn, AssociationDefinition), defn.fqn), []).append(defn)
+            for prop in defn.property_definitions.values():
+                property_groups.setdefault(prop.type, []).append(prop)
+
+        with ThreadPoolExecutor(max_workers = max_workers) as executor:
+            futures = [executor.submit(clean.report.with_counters(_load_entity_types), group) for group in entity_groups.values()]
+            futures += [executor.submit(clean.report.with_counters(_load_property_types), group) for group in property_groups.values()]
+            for future in futures:
+                future.result()
+
+            # entity_type slots are filled now (or None for malformed fqns)
+            key_ids = set()
+            for defn in definitions:
+                if defn.entity_type and defn.entity_type.key:
+                    key_ids.update(defn.entity_type.key)
+            key_ids = list(key_ids)
+            key_types = dict(zip(key_ids, executor.map(clean.report.with_counters(self.edm_api.get_property_type), key_ids)))
+
+        for defn in definitions:
+            if defn.entity_type:
+                defn.key_property_types = [key_types[p] for p in defn.entity_type.key or []]
+
     
     def deserialize_from_wiki(self, wikistring):
         """
@@ -924,17 +1380,16 @@ class Flight(object):
     def refresh_schema(self):
         """
         Refreshes the schema instance variable with the latest changes made to the flight.
+
+        Definitions cache their own schema, so only the ones that changed since the last refresh are re-derived.
+        The cached schemas are copied rather than tagged with the flight name in place.
         """
 
         self.schema = {
-            "entityDefinitions": {key: defn.get_schema() for key, defn in self.entity_definitions.items()},
-            "associationDefinitions": {key: defn.get_schema() for key, defn in self.association_definitions.items()}
+            "entityDefinitions": {key: dict(defn.get_schema(), flight = self.name) for key, defn in self.entity_definitions.items()},
+            "associationDefinitions": {key: dict(defn.get_schema(), flight = self.name) for key, defn in self.association_definitions.items()}
         }
 
-        for defn_type in ["entityDefinitions", "associationDefinitions"]:
-            for defn in self.schema[defn_type].values():
-                defn["flight"] = self.name
-
     def delete_column(self, column):
         """
         Delete all references to a specific column in this flight
@@ -957,24 +1412,19 @@ class Flight(object):
         return not bool(self.entity_definitions)
 
     def delete_entity_definition(self, name):
+        index = self.get_graph_index()
         real_name = name
         if name in self.entity_definitions.keys():
             if self.entity_definitions[name].name:
                 real_name = self.entity_definitions[name].name
             del self.entity_definitions[name]
-        else:
-            to_delete = None
-            for alias, defn in self.entity_definitions.items():
-                if defn.name == name:
-                    to_delete = alias
-            if to_delete:
-                del self.entity_definitions[to_delete]
+        elif index.entities_by_name.get(name):
+            del self.entity_definitions[index.entities_by_name[name][-1]]
 
         # delete association definitions connected to this entity definition
-        to_delete = []
-        for alias, defn in self.association_definitions.items():
-            if defn.src_alias == real_name or defn.dst_alias == real_name or alias == name or defn.name == name:
-                to_delete.append(alias)
+        to_delete = index.get_associations(real_name) | set(index.associations_by_name.get(name, []))
+        if name in self.association_definitions.keys():
+            to_delete.add(name)
 
         for alias in to_delete:
             del self.association_definitions[alias]
@@ -1013,6 +1463,8 @@ class Flight(object):
         Mainly for visualisation purposes to be used in visuals
         '''
 
+        self.refresh_schema()
+
         # initiate reduced schema
         reduced_schema = {"nodes": {}, "edges": {}}
 
@@ -1024,12 +1476,13 @@ class Flight(object):
                 reduced_schema['nodes'][entity[type]]['objects'] += [entity]
 
         # edges
+        index = self.get_graph_index()
         for association in self.schema['associationDefinitions'].values():
 
             src = association['src']
             dst = association['dst']
-            entsrcs = [x for x in self.schema['entityDefinitions'].values() if x['name'] == src]
-            entdsts = [x for x in self.schema['entityDefinitions'].values() if x['name'] == dst]
+            entsrcs = [self.schema['entityDefinitions'][alias] for alias in index.entities_by_name.get(src, [])]
+            entdsts = [self.schema['entityDefinitions'][alias] for alias in index.entities_by_name.get(dst, [])]
 
             if not (len(entdsts) == 1 and len(entsrcs) == 1):
                 raise ValueError("  - The source and destination for association \n    %s are not (uniquely) defined."%association['name'])
@@ -1046,6 +1499,7 @@ class Flight(object):
                     reduced_schema['edges'][association[type]]['edges'] += [edge]
         return reduced_schema
 
+    @clean.report.instrumented
     def check_entsets_against_stack(self, create_by = []):
         """
         Checks entity sets for existence, fqn alignment, and potential inadvertent renaming
@@ -1080,14 +1534,17 @@ class Flight(object):
             )
 
 
-        entsets = self.entity_sets_api.get_all_entity_sets()
+        # existence, fqn and overlap checks are answered from an index of this one call,
+        # which stays put while entity sets are created below
+        entsets = edm.EntitySetCache()
+        entsets.index(self.entity_sets_api.get_all_entity_sets())
         done = set()
         for entity in list(self.entity_definitions.values()) + list(self.association_definitions.values()):
             if entity.entity_set_name in done:
                 continue
             done.add(entity.entity_set_name)
             try:
-                prod_entset = self.entity_sets_api.get_entity_set(self.entity_sets_api.get_entity_set_id(entity.entity_set_name))
+                prod_entset = entsets.get_entity_set(entsets.get_entity_set_id(entity.entity_set_name))
                 if entity.get_entity_type().id != prod_entset.entity_type_id:
                     sub_reports['fqn_match'].issues += [f"The entity type of {entity.entity_set_name} does not match the existing entity set."]
             except:
@@ -1108,16 +1565,10 @@ class Flight(object):
                 else:
                     sub_reports['dont_exist'].issues += [f"The entity set {entity.entity_set_name} doesn't exist."]
 
-            possible_overlap = []
-            for entset in entsets:
-                if entset.entity_type_id == entity.entity_type.id and entset.name != entity.entity_set_name:
-                    count = 0
-                    for a, b in zip(list(entity.entity_set_name), list(entset.name)):
-                        if a != b:
-                            break
-                        count+=1
-                    if count >= 3:
-                        possible_overlap.append((count, entset.name))
+            possible_overlap = [
+                (count, name) for count, name in entsets.get_prefix_matches(entity.entity_set_name, entity.get_entity_type().id)
+                if name != entity.entity_set_name
+            ]
             if len(possible_overlap) > 0:
                 overlaps = ", ".join([b for a, b in sorted(possible_overlap, reverse = True)])
                 toadd = [f"For {entity.entity_set_name}, did you mean any from: {overlaps}"]
@@ -1280,24 +1731,72 @@ class Flight(object):
         may not be stable against changes in flight syntax specifications.
         """
 
-        cols = set()
-        for ent in self.entity_definitions.values():
-            cols = cols.union(ent.get_columns())
-        for assn in self.association_definitions.values():
-            cols = cols.union(assn.get_columns())
-        return cols
+        return set(self.get_column_index().keys())
+
+    def get_column_index(self):
+        """
+        Returns a dict mapping each column referenced in this flight to the list of property definitions using it
+
+        The index is kept until a definition in the flight changes; don't modify it in place.
+        """
+
+        revision = self.get_revision()
+        if self._column_index is None or self._column_index_revision != revision:
+            index = dict()
+            for defn in list(self.entity_definitions.values()) + list(self.association_definitions.values()):
+                for property in defn.property_definitions.values():
+                    for column in property.get_columns():
+                        index.setdefault(column, []).append(property)
+            self._column_index = index
+            self._column_index_revision = revision
+        return self._column_index
+
+    def get_revision(self):
+        """
+        Gets a value that changes whenever a definition is added to, removed from or changed in this flight.
+        """
+
+        return (
+            tuple((alias, defn, defn.get_revision()) for alias, defn in self.entity_definitions.items()),
+            tuple((alias, defn, defn.get_revision()) for alias, defn in self.association_definitions.items())
+        )
 
     def get_entity_definition_by_name(self, name):
         """
-        Looks up an entity definition first by alias (dictionary key lookup), then by name (iteration)
+        Looks up an entity definition first by alias (dictionary key lookup), then by name (graph index)
         """
 
         if name in self.entity_definitions.keys():
             if not self.entity_definitions[name].name or self.entity_definitions[name].name == name:
                 return self.entity_definitions[name]
-        for entity in self.entity_definitions.values():
-            if entity.name == name:
-                return entity
+        aliases = self.get_graph_index().entities_by_name.get(name)
+        if aliases:
+            return self.entity_definitions[aliases[0]]
+
+    def get_graph_index(self):
+        """
+        Gets the name lookups and association adjacency of this flight as a _GraphIndex.
+
+        The index is rebuilt lazily, when definitions were added, removed or renamed (or re-linked) since the last call.
+        """
+
+        if self._graph_index is None or self._graph_index_revision != self._revision:
+            self._graph_index = _GraphIndex(self.entity_definitions, self.association_definitions)
+            self._graph_index_revision = self._revision
+        return self._graph_index
+
+    def __setattr__(self, name, value):
+        if name in ("entity_definitions", "association_definitions"):
+            value = _DefinitionDict(self, value)
+            self.mark_dirty()
+        super().__setattr__(name, value)
+
+    def mark_dirty(self):
+        """
+        Flags the definitions of this flight as changed. Called by the definitions and the definition dicts.
+        """
+
+        self._revision += 1
 
 
     def get_all_entity_sets(self, remove_prefix="", add_prefix="", add_suffix="", contacts=[]):
@@ -1422,12 +1921,149 @@ class Flight(object):
         engine = atlas.get_atlas_engine_for_individual_user(self.organization_id, self.configuration)
         return engine
 
-    def validate_flight_against_atlas(self, table_name = None, engine = None, log_level = "none"):
+    def get_data_checks(self):
+        """
+        Lists the checks on the source data implied by this flight's parsers, for data_preflight_validation.
+
+        Every check is a dict with the alias of the definition, the property alias (None for primary keys),
+        the columns, the kind of check and, for dates, the java patterns. Parsing checks are only listed
+        for properties reading a single column.
+        """
+
+        checks = []
+        for alias, defn in list(self.entity_definitions.items()) + list(self.association_definitions.items()):
+            for prop_alias, prop in defn.property_definitions.items():
+                columns = sorted(prop.get_columns())
+                if len(columns) != 1:
+                    continue
+                base = {"definition": alias, "property": prop_alias, "columns": columns}
+                transforms = _get_transforms_used_in(prop.transforms)
+                for transform, (kind, check) in _VALUE_CHECKS.items():
+                    if transform in transforms:
+                        checks.append(dict(base, kind = kind, check = check))
+                patterns = _get_date_patterns(prop.transforms)
+                if patterns:
+                    checks.append(dict(base, kind = "date", check = lambda values, patterns = patterns: datetimes.parses(values, patterns), patterns = patterns))
+                datatype = prop.get_property_type().datatype if prop.get_property_type() else None
+                if datatype and datatype.startswith(("Geography", "Geometry")):
+                    checks.append(dict(base, kind = "geography", check = lambda values, datatype = datatype: clean.utils.is_geography(values, datatype)))
+            pk_columns = defn.get_columns_from_pk()
+            if pk_columns:
+                checks.append({"definition": alias, "property": None, "columns": sorted(pk_columns), "kind": "primary key"})
+        return checks
+
+    def profile_source(self, table_name = None, engine = None, sql = None, df = None, distinct_sampling = 16, refresh = False):
+        """
+        Profiles the columns of this flight in the source, with one pass over the data (see clean.atlas.profile)
+
+        Besides the statistics of every column in get_all_columns(), the profile has the exact number of
+        distinct primary keys of every definition. Profiles of atlas tables and queries are cached.
+
+        :return: clean.atlas.TableProfile
+        """
+
+        if df is None and not engine:
+            engine = self.get_atlas_engine_for_organization()
+        definitions = list(self.entity_definitions.values()) + list(self.association_definitions.values())
+        # definitions without a key (nor an ol.id property) have no key columns to count
+        pk_columns = [defn.get_columns_from_pk() for defn in definitions]
+        return clean.atlas.profile(
+            table_name = table_name,
+            engine = engine,
+            sql = sql,
+            df = df,
+            columns = self.get_all_columns(),
+            column_groups = sorted(set(tuple(sorted(columns)) for columns in pk_columns if columns)),
+            distinct_sampling = distinct_sampling,
+            refresh = refresh
+        )
+
+    @clean.report.instrumented
+    def data_preflight_validation(self, table_name = None, engine = None, df = None, chunksize = 100000, log_level = "none"):
+        """
+        Checks the source data against the parsers of this flight, before shuttle runs into them.
+
+        Values read by ParseInt/ParseDouble/ParseBool transforms have to parse, values read by date
+        transforms have to match one of their patterns, geography values have to be well formed and the
+        primary key columns of every definition must not be all null. Checks run vectorized on chunks of
+        the source: the atlas table (streamed in chunks of chunksize rows) or a pandas.DataFrame.
+        Columns that don't exist in the source are left to validate_flight_against_atlas.
+
+        :return: ValidationReport with a sub report, stating the failure rate, per check
+        """
+
+        report = clean.report.ValidationReport(
+            title = "Data Preflight Validation" + (f" for Flight {self.name}" if self.name else "")
+        )
+
+        checks = self.get_data_checks()
+        if df is not None:
+            available = set(df.columns)
+            chunks = (df.iloc[i:i + chunksize] for i in range(0, df.shape[0], chunksize))
+        elif table_name:
+            if not engine:
+                engine = self.get_atlas_engine_for_organization()
+            available = set(clean.atlas.get_datatypes(table_name, engine).index)
+            needed = sorted(set(c for check in checks for c in check["columns"]) & available)
+            chunks = clean.atlas.read_sql_chunks(
+                f'SELECT {clean.atlas.cols_to_string_with_dubquotes(needed)} FROM "{table_name}"',
+                engine,
+                chunksize
+            ) if needed else []
+        else:
+            report.validated = False
+            report.issues.append("No table name or DataFrame given.")
+            report.print_status(log_level = log_level)
+            return report
+
+        checks = [check for check in checks if set(check["columns"]) <= available]
+        counts = [{"checked": 0, "failed": 0, "examples": []} for check in checks]
+        for chunk in chunks:
+            for check, count in zip(checks, counts):
+                if check["kind"] == "primary key":
+                    blank = pd.concat([clean.utils.is_blank(chunk[c]) for c in check["columns"]], axis = 1).all(axis = 1)
+                    count["checked"] += chunk.shape[0]
+                    count["failed"] += int(blank.sum())
+                    continue
+                values = chunk[check["columns"][0]]
+                values = values[~clean.utils.is_blank(values)]
+                failed = values[~check["check"](values).astype(bool)]
+                count["checked"] += values.shape[0]
+                count["failed"] += failed.shape[0]
+                count["examples"] += [str(x) for x in failed.head(3 - len(count["examples"]))]
+
+        for check, count in zip(checks, counts):
+            sub = clean.report.ValidationReport(
+                title = f"{check['kind'].capitalize()} check for {check['definition']}" + \
+                    (f", {check['property']}" if check["property"] else "") + f" ({', '.join(check['columns'])})"
+            )
+            rate = count["failed"] / count["checked"] if count["checked"] else 0.
+            if check["kind"] == "primary key":
+                if count["failed"]:
+                    sub.issues.append(f"{count['failed']} of {count['checked']} rows ({rate:.2%}) have no primary key values.")
+                # rows without a key are skipped by shuttle, which is only a problem if it's all of them
+                sub.validated = not (count["checked"] and count["failed"] == count["checked"])
+            elif count["failed"]:
+                sub.validated = False
+                patterns = f" with patterns {check['patterns']}" if "patterns" in check else ""
+                sub.issues.append(
+                    f"{count['failed']} of {count['checked']} values ({rate:.2%}) don't parse as {check['kind']}{patterns}, "
+                    f"e.g. {', '.join(count['examples'])}"
+                )
+            report.sub_reports.append(sub)
+
+        report.validate()
+        _print_status_post_order(report, log_level = log_level)
+        return report
+
+    @clean.report.instrumented
+    def validate_flight_against_atlas(self, table_name = None, engine = None, log_level = "none", table_datatypes = None):
         '''
         Validates the flight with a table on atlas
 
         :param table_name: name of the table to accompany the flight
         :param engine: sqlalchemy.Engine
+        :param table_datatypes: pandas.DataFrame as returned by clean.atlas.get_datatypes, if already known
         :return: dict with parameters "validated" (True/False) and "report" which contains the report
         '''
 
@@ -1444,12 +2080,12 @@ class Flight(object):
             report.print_status(log_level = log_level)
             return report
 
-        if not engine:
-            engine = self.get_atlas_engine_for_organization()
-
         # current datatypes of the atlas table
-        type_is = clean.atlas.get_datatypes(table_name, engine) \
-            .rename(columns={"data_type": "postgres_data_type"})
+        if table_datatypes is None:
+            if not engine:
+                engine = self.get_atlas_engine_for_organization()
+            table_datatypes = clean.atlas.get_datatypes(table_name, engine)
+        type_is = table_datatypes.rename(columns={"data_type": "postgres_data_type"})
 
         table_exists_report = clean.report.ValidationReport(
             title="Check if table exists."
@@ -1467,21 +2103,12 @@ class Flight(object):
 
         table_exists_report.print_status(log_level = log_level)
 
-        # data type the columns should be
+        # data type the columns should be (properties without a column are written by transforms)
         flight_types = self.get_datatypes_by_column()
-        type_should_java = pd.DataFrame([
-            {"column": k, "ol_data_type": v} for k, v in flight_types.items()])
-
-        # linkage between postgres and open lattice
-        ol_to_postgres = [
-            {"ol_data_type": oltype, "postgres_data_type": pstype} \
-            for oltype, pstypes in constants.datatypes.POSTGRES_TO_OL.items() for pstype in pstypes]
-        ol_to_postgres = pd.DataFrame(ol_to_postgres)
-        type_should = type_should_java.merge(
-            ol_to_postgres,
-            how='left',
-            on='ol_data_type'
-        ).set_index('column')
+        type_should = pd.DataFrame(
+            [(k, v) for k, v in flight_types.items() if k],
+            columns = ["column", "ol_data_type"]
+        )
 
         # check for missing columns
         missing_columns_report = clean.report.ValidationReport(
@@ -1489,34 +2116,28 @@ class Flight(object):
         )
         report.sub_reports.append(missing_columns_report)
 
-        missing_columns = list(set(type_should.index) - set(type_is.index))
+        missing_columns = sorted(set(type_should.column) - set(type_is.index))
         if len(missing_columns) > 0:
             missing_columns_report.validated = False
             missing_columns_report.issues.append("The following columns are missing from the table: %s\n" % ", ".join(missing_columns))
 
         missing_columns_report.print_status(log_level = log_level)
 
-        # compare data types
-        all_cols = list(self.get_all_columns() - set(missing_columns))
-        mismatches = []
-        for column in all_cols:
-            current_type = type_is.loc[column].postgres_data_type
-            required_types = type_should.loc[column].postgres_data_type
-            if isinstance(type_should.loc[column].postgres_data_type, pd.Series):
-                required_types = list(required_types)
-            else:
-                required_types = [required_types]
-            match = current_type in required_types
-            if not match:
-                mismatches += """
+        # compare data types: a column matches if its (ol type, postgres type) pair is in POSTGRES_TO_OL
+        compared = type_should.merge(type_is, left_on = "column", right_index = True) \
+            .merge(_OL_TO_POSTGRES.assign(match = True), how = "left", on = ["ol_data_type", "postgres_data_type"])
+        required_types = _OL_TO_POSTGRES.groupby("ol_data_type").postgres_data_type.agg(", ".join)
+        mismatches = [
+            """
                     Data type mismatch:
                     column "{column}" is of type "{atlas_type} "
                     but should be: "{prod_type}"
                     """.format(
-                    column=column,
-                    atlas_type=current_type,
-                    prod_type=", ".join(required_types)
-                )
+                column = row.column,
+                atlas_type = row.postgres_data_type,
+                prod_type = required_types.get(row.ol_data_type, "")
+            ) for row in compared[compared.match.isna()].itertuples()
+        ]
         datatype_report = clean.report.ValidationReport(
             title="Mismatching data types",
         )
@@ -1530,6 +2151,7 @@ class Flight(object):
         report.print_status(log_level = log_level)
         return report
 
+    @clean.report.instrumented
     def source_destination_validation(self, log_level = "none"):
         """
         Determines whether sources and destinations are in the EDM
@@ -1567,6 +2189,7 @@ class Flight(object):
         return report
 
 
+    @clean.report.instrumented
     def edm_validation(self, log_level = "none"):
         """
         Determines if all fqns exist in the EDM.
@@ -1597,6 +2220,7 @@ class Flight(object):
         return report
 
 
+    @clean.report.instrumented
     def parsers_validation(self, log_level = "none"):
         """
         Determines whether appropriate parsers are included
@@ -1622,18 +2246,25 @@ class Flight(object):
 
 
 
-    def datatypes_validation(self, log_level = "none"):
+    @clean.report.instrumented
+    def datatypes_validation(self, log_level = "none", parsers_report = None):
         """
         Determines whether all property definitions are writing the proper datatype.
+
+        A report from parsers_validation can be passed in to avoid running it again.
         """
 
         # TODO combine parsers_validation with validate_flight_against_atlas
 
         print("Datatypes validation check is not implemented yet! Checking a stricter condition: parsers validation")
 
+        if parsers_report is not None:
+            parsers_report.print_status(log_level = log_level)
+            return parsers_report
         return self.parsers_validation(log_level = log_level)
 
 
+    @clean.report.instrumented
     def datetimetransform_timezone_validation(self, log_level = "none"):
         """
         timezone in Datatimetransform is broken. This checks if it's being used.
@@ -1655,6 +2286,7 @@ class Flight(object):
 
 
 
+    @clean.report.instrumented
     def entity_sets_validation(self, log_level = "none"):
         """
         Determines whether all entity sets exist and have the FQNs specified in this flight.
@@ -1687,6 +2319,7 @@ class Flight(object):
         return report
         
 
+    @clean.report.instrumented
     def necessary_components_validation(self, log_level = "none"):
         """
         Determines whether all required components of this flight's entity/association definitions are defined.
@@ -1722,6 +2355,7 @@ class Flight(object):
         return report
 
 
+    @clean.report.instrumented
     def unique_names_validation(self, log_level = "none"):
         """
         Determines if a flight's entity/association definitions have unique names.
@@ -1747,11 +2381,16 @@ class Flight(object):
         report.print_status(log_level = log_level)
         return report
 
-    def final_pre_launch_validation(self, table_name = None, engine = None, log_level = "none"):
+    @clean.report.instrumented
+    def final_pre_launch_validation(self, table_name = None, engine = None, log_level = "none", max_workers = 8):
         """
         Determines whether a given flight is ready for a shuttle run.
 
         log_level can be "all", "failures", or "none".
+
+        The EDM objects and entity sets used by the checks are fetched once up front, after which the
+        validators run concurrently on a thread pool. Statuses are printed when all of them are done,
+        sub reports ahead of the report they belong to.
         """
 
         report = clean.report.ValidationReport(
@@ -1761,19 +2400,37 @@ class Flight(object):
         # if log_level == "all":
         #     print(f"Starting on {report.title}")
 
-        report.sub_reports = [
-            self.edm_validation(log_level = log_level),
-            self.validate_flight_against_atlas(table_name = table_name, engine = engine, log_level = log_level),
-            self.entity_sets_validation(log_level = log_level),
-            self.necessary_components_validation(log_level = log_level),
-            self.unique_names_validation(log_level = log_level),
-            self.datatypes_validation(log_level = log_level),
-            self.datetimetransform_timezone_validation(log_level = log_level)
-        ]
+        with ThreadPoolExecutor(max_workers = max_workers) as executor:
+            # the remote work of the workers counts towards this report's instrumentation
+            submit = lambda function, *args, **kwargs: executor.submit(clean.report.with_counters(function), *args, **kwargs)
+            fetches = [
+                submit(self.prefetch_edm, max_workers = max_workers),
+                submit(self.entity_sets_api.get_all_entity_sets)
+            ]
+            for fetch in fetches:
+                fetch.result()
+
+            # no logs on purpose -- printed in order below
+            parsers = submit(self.parsers_validation, log_level = "none")
+            validations = [
+                submit(self.edm_validation, log_level = "none"),
+                submit(self.validate_flight_against_atlas, table_name = table_name, engine = engine, log_level = "none"),
+                submit(self.entity_sets_validation, log_level = "none"),
+                submit(self.necessary_components_validation, log_level = "none"),
+                submit(self.unique_names_validation, log_level = "none")
+            ]
+            datetime_reports = submit(self.datetimetransform_timezone_validation, log_level = "none")
+
+            report.sub_reports = [future.result() for future in validations] + [
+                self.datatypes_validation(log_level = "none", parsers_report = parsers.result()),
+                datetime_reports.result()
+            ]
+
         report.validate()
-        report.print_status(log_level = log_level)
+        _print_status_post_order(report, log_level = log_level)
         return report
 
+    @clean.report.instrumented
     def graph_connectivity_validation(self, log_level = "none"):
         """
         Determines whether all entities are linked by at least one association
@@ -1798,6 +2455,7 @@ class Flight(object):
         report.print_status(log_level = log_level)
         return report
 
+    @clean.report.instrumented
     def consistent_names_validation(self, log_level = "none"):
         report = clean.report.ValidationReport(
             title = "Double Check Name Inconsistencies" + (f" in Flight {self.name}" if self.name else "")
@@ -1820,6 +2478,7 @@ class Flight(object):
         report.print_status(log_level = log_level)
         return report
 
+    @clean.report.instrumented
     def datasource_validation(self, log_level = "none"):
         report = clean.report.ValidationReport(
             title = "Datasource Validation" + (f" for Flight {self.name}" if self.name else "")
@@ -1843,6 +2502,7 @@ class Flight(object):
         report.print_status(log_level = log_level)
         return report
 
+    @clean.report.instrumented
     def red_flags_validation(self, log_level = "none"):
         report = clean.report.ValidationReport(
             title = "Misc. Red Flags that Aren't Necessarily Errors" + (f" in Flight {self.name}" if self.name else "")
@@ -1863,6 +2523,7 @@ class Flight(object):
         return report
         
 
+    @clean.report.instrumented
     def flight_validation(self, table_name = None, engine = None, log_level = "none"):
 
         report = clean.report.ValidationReport(
@@ -1986,14 +2647,23 @@ class Flight(object):
 
         make_parsers = True,
         timezone = None,
+        df = None,
+        engine = None,
+        table_name = None,
  
     ):
         """
         Intelligently fills in omitted redundancies in the flight.
+
+        If the source data is given (df, or engine and table_name), date and time patterns of new parsers are inferred from it.
         """
 
-        all_entity_types = self.edm_api.get_all_entity_types()
-        all_property_types = self.edm_api.get_all_property_types()
+        if isinstance(self.edm_api, edm.EdmCache):
+            entity_index = self.edm_api.get_name_index("entity")
+            property_index = self.edm_api.get_name_index("property")
+        else:
+            entity_index = edm.EdmNameIndex(self.edm_api.get_all_entity_types())
+            property_index = edm.EdmNameIndex(self.edm_api.get_all_property_types())
 
         new_ent_names = dict()
         for alias, entity in list(self.entity_definitions.items()) + list(self.association_definitions.items()):
@@ -2011,7 +2681,8 @@ class Flight(object):
 
             # create fqn
             if not entity.fqn and create_entity_fqns:
-                entity.fqn = ".".join(deduce_edm_object(alias, from_pool = all_entity_types))
+                entity.fqn = ".".join(deduce_edm_object(alias, index = entity_index))
+                _print_suggestions(entity.fqn, entity_index)
 
             # add entity names
             if create_entity_names:
@@ -2023,9 +2694,9 @@ class Flight(object):
 
             # replace "pk" with actual pk property type
             if "pk" in entity.property_definitions.keys():
-                pks = entity.get_entity_type().key
-                if pks:
-                    pk_type = self.edm_api.get_property_type(pks[0])
+                key_types = entity.get_key_property_types()
+                if key_types:
+                    pk_type = key_types[0]
                     pk = "%s.%s"%(pk_type.type.namespace, pk_type.type.name)
                 else:
                     pk = "ol.id"
@@ -2036,7 +2707,8 @@ class Flight(object):
             for prop_alias, property in entity.property_definitions.items():
                 #deduce property fqn from alias
                 if not property.type:
-                    property.type = ".".join(deduce_edm_object(prop_alias, from_pool = all_property_types))
+                    property.type = ".".join(deduce_edm_object(prop_alias, index = property_index))
+                    _print_suggestions(property.type, property_index)
 
         for alias, new_alias in new_ent_names.items():
             if alias in self.entity_definitions.keys():
@@ -2067,7 +2739,7 @@ class Flight(object):
         if make_parsers:
             for entity in list(self.entity_definitions.values()) + list(self.association_definitions.values()):
                 for property in entity.property_definitions.values():
-                    property.add_datatype_parser_if_needed(timezone = timezone)
+                    property.add_datatype_parser_if_needed(timezone = timezone, df = df, engine = engine, table_name = table_name)
 
         self.refresh_schema()
 
@@ -2099,54 +2771,247 @@ def _add_missing_association_pks(flight, edmAPI, infer_columns = False, columns
                 entity['propertyDefinitions'][keyprops[0]] = {"type":keyprops[0], "transforms":[{"transforms.HashTransform":None, "columns":columns, "hashFunction":"sha256"}]}
 
 
-def _write_trans_conds_list(trans_conds_list, trans_conds, depth):
-    out_string = ""
+def _print_status_post_order(report, log_level = "none"):
+    """
+    Prints the status of all reports in a tree, children before their parents.
+    """
+
+    for sub in report.sub_reports:
+        _print_status_post_order(sub, log_level = log_level)
+    report.print_status(log_level = log_level)
+
+
+class _DefinitionDict(dict):
+    """
+    The entity or association definitions of a flight: adding, replacing or removing a definition
+    marks the flight as changed, and so does changing a contained definition (see EntityDefinition.mark_dirty).
+
+    Assigning a plain dict to Flight.entity_definitions or association_definitions wraps it in a copy.
+    """
+
+    def __init__(self, flight, definitions = ()):
+        super().__init__()
+        self._flight = flight
+        self.update(definitions)
+
+    def __setitem__(self, alias, definition):
+        previous = self.get(alias)
+        super().__setitem__(alias, definition)
+        self._forget(previous)
+        definition._get_flights().add(self._flight)
+        self._flight.mark_dirty()
+
+    def __delitem__(self, alias):
+        previous = self[alias]
+        super().__delitem__(alias)
+        self._forget(previous)
+        self._flight.mark_dirty()
+
+    def pop(self, alias, *default):
+        if alias not in self:
+            return super().pop(alias, *default)
+        definition = self[alias]
+        del self[alias]
+        return definition
+
+    def popitem(self):
+        alias, definition = super().popitem()
+        self._forget(definition)
+        self._flight.mark_dirty()
+        return alias, definition
+
+    def setdefault(self, alias, definition = None):
+        if alias not in self:
+            self[alias] = definition
+        return self[alias]
+
+    def update(self, *args, **kwargs):
+        for alias, definition in dict(*args, **kwargs).items():
+            self[alias] = definition
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+    def clear(self):
+        definitions = list(self.values())
+        super().clear()
+        for definition in definitions:
+            self._forget(definition)
+        self._flight.mark_dirty()
+
+    def _forget(self, definition):
+        # a definition can be listed under two aliases for a moment while renaming
+        if definition is not None and not any(defn is definition for defn in self.values()):
+            definition._get_flights().discard(self._flight)
+
+
+class _GraphIndex(object):
+    """
+    Name lookups and association adjacency for the definitions of a flight.
+
+    Associations refer to their source and destination by alias or by name, so the adjacency lists
+    are keyed by those references as they appear in the flight. All values are lists of aliases.
+    """
+
+    def __init__(self, entity_definitions, association_definitions):
+        self.entities_by_name = dict()
+        for alias, defn in entity_definitions.items():
+            self.entities_by_name.setdefault(defn.name, []).append(alias)
+
+        self.associations_by_name = dict()
+        self.outgoing = dict()
+        self.incoming = dict()
+        for alias, defn in association_definitions.items():
+            self.associations_by_name.setdefault(defn.name, []).append(alias)
+            self.outgoing.setdefault(defn.src_alias, []).append(alias)
+            self.incoming.setdefault(defn.dst_alias, []).append(alias)
+
+    def get_associations(self, *references):
+        """
+        Gets the set of aliases of associations starting or ending at any of the references.
+        """
+
+        out = set()
+        for reference in references:
+            out.update(self.outgoing.get(reference, []))
+            out.update(self.incoming.get(reference, []))
+        return out
+
+
+def _load_entity_types(definitions):
+    """
+    Loads the entity (or association) type for the first definition and shares it with the rest.
+    """
+
+    first = definitions[0]
+    if isinstance(first, AssociationDefinition):
+        first.load_association_type()
+        for defn in definitions[1:]:
+            defn.association_type = first.association_type
+            defn.entity_type = first.entity_type
+    else:
+        first.load_entity_type()
+        for defn in definitions[1:]:
+            defn.entity_type = first.entity_type
+
+
+def _load_property_types(definitions):
+    """
+    Loads the property type for the first definition and shares it with the rest.
+    """
+
+    definitions[0].load_property_type()
+    for defn in definitions[1:]:
+        defn.property_type = definitions[0].property_type
+
+
+class _FlightLoader(getattr(yaml, "CSafeLoader", yaml.SafeLoader)):
+    """
+    A safe yaml loader (backed by libyaml where available) that understands shuttle's tags.
+
+    A transform or condition tagged !<transforms.X> is loaded as {"transforms.X": None, **arguments}
+    (or {"transforms.X": {}} for an empty flow mapping), the same dictionaries the rest of this module
+    works with. !<generators.TransformSeriesGenerator> tags are dropped.
+    """
+
+
+def _shuttle_function_constructor(prefix):
+    def construct(loader, suffix, node):
+        name = prefix + suffix
+        if isinstance(node, yaml.MappingNode):
+            arguments = loader.construct_mapping(node, deep = True)
+            if not arguments:
+                return {name: {}}
+            return {name: None, **arguments}
+        if isinstance(node, yaml.SequenceNode):
+            return {name: loader.construct_sequence(node, deep = True)}
+        value = loader.construct_scalar(node)
+        return {name: value if value else None}
+    return construct
+
+
+def _construct_untagged(loader, suffix, node):
+    if isinstance(node, yaml.MappingNode):
+        return loader.construct_mapping(node, deep = True)
+    if isinstance(node, yaml.SequenceNode):
+        return loader.construct_sequence(node, deep = True)
+    return loader.construct_object(
+        yaml.ScalarNode(loader.resolve(yaml.ScalarNode, node.value, (True, False)), node.value),
+        deep = True
+    )
+
+
+for _prefix in ["transforms.", "conditions.", "com.openlattice.shuttle."]:
+    _FlightLoader.add_multi_constructor(_prefix, _shuttle_function_constructor(_prefix))
+_FlightLoader.add_multi_constructor("generators.", _construct_untagged)
+
+
+def _load_flight_dict(string):
+    return yaml.load(string, Loader = _FlightLoader)
+
+
+class _EscapingWriter(object):
+    """
+    Wraps a file handle, escaping backslashes in everything written to it.
+    """
+
+    def __init__(self, fp):
+        self.fp = fp
+
+    def write(self, string):
+        self.fp.write(string.replace('\\', "\\\\"))
+
+
+def _write_trans_conds_list(write, trans_conds_list, trans_conds, depth):
     prefix_cond = trans_conds + '.'
     prefix_tran = "transforms."
     for tc in trans_conds_list:
         keys = list(tc.keys())
         if keys == ["column"]:
-            out_string += " " * depth + "- !<transforms.ColumnTransform>\n" + \
-            " " * (depth + 2) + 'column: "' + tc["column"] + '"\n'
+            write(" " * depth + "- !<transforms.ColumnTransform>\n")
+            write(" " * (depth + 2) + 'column: "' + tc["column"] + '"\n')
         elif keys == ["value"]:
-            out_string += " " * depth + "- !<transforms.ValueTransform>\n" + \
-            " " * (depth + 2) + 'value: "' + tc["value"] + '"\n'
+            write(" " * depth + "- !<transforms.ValueTransform>\n")
+            write(" " * (depth + 2) + 'value: "' + tc["value"] + '"\n')
         else:
             tc_name = next((s for s in tc.keys() if prefix_cond in s or prefix_tran in s), None)
             if not tc_name:
                 raise ValueError(str(tc.keys()))
             if prefix_cond in tc_name or prefix_tran in tc_name:
-                out_string += " " * depth + "- !<" + tc_name + '>'
+                write(" " * depth + "- !<" + tc_name + '>')
             else:
-                out_string += " " * depth + "- !<" + prefix_cond + tc_name + '>'
+                write(" " * depth + "- !<" + prefix_cond + tc_name + '>')
             if tc[tc_name] is not None:
-                out_string += ' ' + str(tc[tc_name])
-            out_string += '\n'
+                write(' ' + str(tc[tc_name]))
+            write('\n')
             depth += 2
             for argkey, argval in sorted(tc.items()):
                 if prefix_cond not in argkey and prefix_tran not in argkey:
-                    out_string += " " * depth + argkey + ':'
+                    write(" " * depth + argkey + ':')
                     if type(argval) == list:
                         if len(argval) == 0:
-                            out_string += ' []\n'
+                            write(' []\n')
                         elif type(argval[0]) == dict:
-                            out_string += '\n' + _write_trans_conds_list(argval, trans_conds, depth)
+                            write('\n')
+                            _write_trans_conds_list(write, argval, trans_conds, depth)
                         else:
-                            out_string += ' [' + clean.cols_to_string_with_dubquotes(argval) + ']\n'
+                            write(' [' + clean.cols_to_string_with_dubquotes(argval) + ']\n')
                     elif type(argval) == str:
-                        out_string += ' "' + str(argval) + '"\n'
+                        write(' "' + str(argval) + '"\n')
                     else:
-                        out_string += ' ' + str(argval) + '\n'
+                        write(' ' + str(argval) + '\n')
             depth -= 2
-    return out_string
 
 
 
-def deduce_edm_object(name, edm_api = None, category = "entity", from_pool = None):
+def deduce_edm_object(name, edm_api = None, category = "entity", from_pool = None, index = None):
     """
     Deduces which fqn is meant by the given string.
 
     Can be used (like in the fill_in function) to avoid needing to remember the namespaces of entity/property types.
+    A plain EdmApi is wrapped in the shared EdmCache, so repeated calls (and warm processes) don't refetch the EDM.
+    Callers deducing many names should pass a prebuilt edm.EdmNameIndex as index.
     """
 
     name = re.sub("[0-9]+", "", name).replace(" ","")
@@ -2157,12 +3022,14 @@ def deduce_edm_object(name, edm_api = None, category = "entity", from_pool = Non
         return ("o", "is")
     if name in {"person", "datetime"}:
         return ("general", name)
-    if from_pool is None:
-        if category in ["entity", "association"]:
-            from_pool = edm_api.get_all_entity_types()
+    if index is None:
+        if from_pool is not None:
+            index = edm.EdmNameIndex(from_pool)
         else:
-            from_pool = edm_api.get_all_property_types()
-    search_space = {x.type.namespace: x.type.name for x in from_pool if x.type.name.lower() == name.lower() and "-d" not in x.type.name.lower() and "-d" not in x.description.lower() and "-d" not in x.title.lower()}
+            if not isinstance(edm_api, edm.EdmCache):
+                edm_api = edm.get_shared_edm_cache(edm_api)
+            index = edm_api.get_name_index(category)
+    search_space = index.lookup(name)
     if len(search_space) == 0:
         return ("ol", name)
     if "ol" in search_space.keys():
@@ -2173,6 +3040,31 @@ def deduce_edm_object(name, edm_api = None, category = "entity", from_pool = Non
     return (key, search_space[key])
 
 
+def _print_suggestions(fqn, index):
+    """
+    Prints "did you mean" suggestions if a deduced fqn doesn't exist in the EDM.
+    """
+
+    if index.lookup(fqn.split(".")[-1]):
+        return
+    suggestions = index.suggest(fqn)
+    if suggestions:
+        print(f"{fqn} is not in the EDM. Did you mean any of these: {', '.join(suggestions)}")
+
+
+def _get_suggestions_string(edm_api, fqn, category):
+    """
+    Gets a " Did you mean ...?" string for an fqn that doesn't exist, if the EDM is cached and there are close matches.
+    """
+
+    if not isinstance(edm_api, edm.EdmCache) or not fqn:
+        return ""
+    suggestions = edm_api.get_name_index(category).suggest(fqn)
+    if not suggestions:
+        return ""
+    return f" Did you mean any of these: {', '.join(suggestions)}"
+
+
 def _delete_column_from_object(tr_con_dict, column, context = []):
     """
     Delete a column from a transformation or condition while preserving syntax
@@ -2256,6 +3148,24 @@ def _parse_functions(value, kind):
 
     return {kind: transforms, "columns": list(set(columns))}
 
+def _get_date_patterns(subflight_dict):
+    """
+    Collects the patterns of all date/time transforms in (a part of) a flight.
+    """
+
+    patterns = []
+    if type(subflight_dict) is list:
+        for v in subflight_dict:
+            patterns += _get_date_patterns(v)
+    elif type(subflight_dict) is dict:
+        if _DATE_TRANSFORMS & set(subflight_dict.keys()) and subflight_dict.get("pattern"):
+            pattern = subflight_dict["pattern"]
+            patterns += pattern if isinstance(pattern, list) else [pattern]
+        for v in subflight_dict.values():
+            if type(v) is dict or type(v) is list:
+                patterns += _get_date_patterns(v)
+    return patterns
+
 def _get_transforms_used_in(subflight_dict):
     trs = set()
     if type(subflight_dict) is list:
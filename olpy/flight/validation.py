@@ -0,0 +1,125 @@
+from dataclasses import asdict
+import threading
+import sqlite3
+import hashlib
+import json
+import time
+import os
+
+from .. import clean
+
+DEFAULT_CACHE_PATH = os.environ.get("OLPY_VALIDATION_CACHE")
+
+# part of every key: bump it when the checks of a cached validator change, so reports stored by older code aren't served
+VALIDATOR_VERSION = 1
+
+try:
+    from importlib.metadata import version as _get_distribution_version
+    _OLPY_VERSION = _get_distribution_version("olpy")
+except Exception:
+    _OLPY_VERSION = None
+
+
+class ValidationCache(object):
+    """
+    A cache of ValidationReports, keyed by get_key()
+
+    Reports are kept in memory and, if a path is given, in a sqlite file so they survive the process.
+    Every get returns a fresh copy, so callers are free to modify the reports they receive.
+    """
+
+    def __init__(self, path = DEFAULT_CACHE_PATH):
+        self.path = path
+        self._reports = dict()
+        self._lock = threading.Lock()
+        if self.path:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok = True)
+            with sqlite3.connect(self.path) as connection:
+                _create_cache_table(connection)
+
+    def get(self, key):
+        """
+        Gets the report stored under key.
+
+        :return: clean.report.ValidationReport, or None if there is none
+        """
+
+        with self._lock:
+            stored = self._reports.get(key)
+        if stored is None and self.path:
+            with sqlite3.connect(self.path) as connection:
+                row = connection.execute("SELECT report FROM validation_cache WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                stored = json.loads(row[0])
+                with self._lock:
+                    self._reports[key] = stored
+        return _report_from_dict(stored) if stored is not None else None
+
+    def put(self, key, report):
+        """
+        Stores a report under key.
+        """
+
+        stored = asdict(report)
+        with self._lock:
+            self._reports[key] = stored
+        if self.path:
+            with sqlite3.connect(self.path) as connection:
+                connection.execute(
+                    "INSERT OR REPLACE INTO validation_cache VALUES (?, ?, ?)",
+                    (key, json.dumps(stored, default = str), time.time())
+                )
+
+    def clear(self):
+        """
+        Drops all stored reports, including the persisted ones.
+        """
+
+        with self._lock:
+            self._reports = dict()
+        if self.path:
+            with sqlite3.connect(self.path) as connection:
+                connection.execute("DELETE FROM validation_cache")
+
+
+def get_key(*parts):
+    """
+    Gets a stable hash of json-like parts (the check, the definition content, the EDM version, ...).
+
+    The installed olpy version and VALIDATOR_VERSION are always part of the key.
+    """
+
+    content = json.dumps((VALIDATOR_VERSION, _OLPY_VERSION) + parts, sort_keys = True, default = str)
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+_shared_cache = None
+_shared_lock = threading.Lock()
+
+
+def get_shared_validation_cache():
+    """
+    Gets the process-wide ValidationCache, persisted to the OLPY_VALIDATION_CACHE file if that is set.
+    """
+
+    global _shared_cache
+    with _shared_lock:
+        if _shared_cache is None:
+            _shared_cache = ValidationCache()
+        return _shared_cache
+
+
+def _report_from_dict(stored):
+    report = dict(stored)
+    report["sub_reports"] = [_report_from_dict(sub) for sub in stored["sub_reports"]]
+    report["issues"] = list(stored["issues"])
+    return clean.report.ValidationReport(**report)
+
+
+def _create_cache_table(connection):
+    connection.execute("""
+        CREATE TABLE IF NOT EXISTS validation_cache (
+            key TEXT PRIMARY KEY,
+            report TEXT,
+            created_at REAL
+        )""")
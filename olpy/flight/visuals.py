@@ -20,18 +20,20 @@ cols += palettable.tableau.GreenOrange_12.hex_colors
 cols += palettable.tableau.BlueRed_12.hex_colors
 
 class EdmViz(object):
-    def __init__(self, flight=None, schema=None, flights = None, engine = 'dot', splines = 'curved', aesthetics = {}):
+    def __init__(self, flight=None, schema=None, flights = None, engine = 'dot', splines = 'curved', aesthetics = {}, edm_api = None):
+        # edm_api can be an olpy.flight.edm.EdmCache (e.g. backed by an on-disk snapshot); flights bring their own
         self.graph = graphviz.Digraph(comment='Flight',engine=engine, graph_attr={"splines": splines})
+        self.edm_api = edm_api
         if sum([flight != None, schema != None, flights != None]) != 1:
             raise ValueError("Please specify either a flight, multiple flights or a schema.")
         elif schema != None:
             self.schema = schema
         elif flight != None:
-            self.edm_api = flight.edm_api
+            self.edm_api = edm_api if edm_api is not None else flight.edm_api
             self.flight = flight
             self.schema = flight.schema
         elif flights != None:
-            self.edm_api = flights[0].edm_api
+            self.edm_api = edm_api if edm_api is not None else flights[0].edm_api
             self.flights = flights
         self.aesthetics = self.get_aesthetics(manual_aesthetics = aesthetics)
 
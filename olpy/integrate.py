@@ -81,12 +81,14 @@ def integration_checksums(
     engine = None,
     df = None,
     entity_set_names = None,
-    check_random_n_entity_sets = None
+    check_random_n_entity_sets = None,
+    table_name = None
     ):
     """
     For a given list of entity sets, checks the number of unique pk values in source data against those integrated
 
     The list of entity sets to check may be passed explicitly or else compiled at random to length n.
+    The source (a query, a table or a DataFrame) is profiled once for all entity sets, see Flight.profile_source.
     """
 
     entity_sets_api = openlattice.EntitySetsApi(openlattice.ApiClient(configuration))
@@ -101,13 +103,14 @@ def integration_checksums(
             entity_set_names = np.random.choice(entity_set_names, size = check_random_n_entity_sets, replace = False)
 
     compiled = [
-        (entity_set_name, set([frozenset(x.get_columns_from_pk()) for x in all_ent_assn_defns if x.entity_set_name == entity_set_name])) for entity_set_name in entity_set_names
+        (entity_set_name, set([tuple(sorted(x.get_columns_from_pk())) for x in all_ent_assn_defns if x.entity_set_name == entity_set_name])) for entity_set_name in entity_set_names
     ]
 
-    out = dict()
+    profile = None
+    if sql or table_name or df is not None:
+        profile = flight.profile_source(table_name = table_name, engine = engine, sql = sql, df = df)
 
-    if sql:
-        sql = sql.replace(";", "")
+    out = dict()
 
     for entity_set_name, col_lists in compiled:
         lower = 0
@@ -117,11 +120,7 @@ def integration_checksums(
             upper = 1
         else:
             for col_list in col_lists:
-                additional = 1
-                if sql:
-                    additional = pd.read_sql("select count(distinct(" + clean.cols_to_string_with_dubquotes(col_list) + ")) from (" + sql + ") foo", engine)["count"].iloc[0]
-                elif df:
-                    additional = len(df[col_list].unique())
+                additional = profile.groups[col_list] if profile and col_list else 1
                 lower += additional - 1 # empty pks are not written to prod
                 upper += additional
         out[entity_set_name] = (lower, upper, data_api.get_entity_set_size(entity_sets_api.get_entity_set_id(entity_set_name)))
@@ -7,11 +7,78 @@ import re
 import subprocess
 import sqlalchemy
 import os
+import collections
+import copy
+import time
+import contextlib
+import threading
+import queue
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
 from urllib.parse import unquote
 from pkg_resources import resource_filename
 import traceback
 
 
+class ChunkSizer(object):
+    """
+    Picks the number of rows to read next, from the throughput and memory use of the chunks so far
+
+    The size keeps doubling (or halving) while that doesn't lower the rows per second and turns around
+    when it does, within minimum and maximum and within what fits in memory_budget, given the measured
+    bytes per row and how many chunks are in memory at once.
+    """
+
+    def __init__(self, size=1000, minimum=100, maximum=1000000, memory_budget=256 * 2 ** 20, chunks_in_memory=2, tolerance=0.1):
+        self.size = size
+        self.minimum = minimum
+        self.maximum = maximum
+        self.memory_budget = memory_budget
+        self.chunks_in_memory = chunks_in_memory
+        self.tolerance = tolerance
+        self.growing = True
+        self.rate = None
+        self.bytes_per_row = None
+        self.history = []
+
+    def record(self, rows, seconds, bytes_per_row):
+        """
+        Records a chunk and returns the size of the next one.
+        """
+
+        self.history.append((rows, seconds, bytes_per_row))
+        rate = rows / max(seconds, 1e-6)
+        if self.rate is not None and rate < self.rate * (1 - self.tolerance):
+            self.growing = not self.growing
+        self.rate = rate
+        self.bytes_per_row = bytes_per_row if self.bytes_per_row is None else (self.bytes_per_row + bytes_per_row) / 2
+
+        size = self.size * 2 if self.growing else self.size // 2
+        fits = self.memory_budget // max(self.bytes_per_row * self.chunks_in_memory, 1)
+        self.size = int(max(self.minimum, min(size, self.maximum, fits)))
+        return self.size
+
+    def summary(self):
+        """
+        Gets the chosen sizes and the measurements they were based on.
+        """
+
+        rows = sum(r for r, _, _ in self.history)
+        seconds = sum(t for _, t, _ in self.history)
+        return {
+            "sizes": [r for r, _, _ in self.history],
+            "last_size": self.size,
+            "rows_per_second": rows / seconds if seconds else None,
+            "bytes_per_row": self.bytes_per_row
+        }
+
+    def __str__(self):
+        summary = self.summary()
+        if not summary["sizes"]:
+            return "No chunks read."
+        return f"Read {len(summary['sizes'])} chunks of {min(summary['sizes'])} to {max(summary['sizes'])} rows " \
+               f"({summary['rows_per_second']:.0f} rows per second, about {summary['bytes_per_row']:.0f} bytes per row)."
+
+
 class Integration(object):
     """
     A class representing an integration configuration
@@ -32,7 +99,19 @@ class Integration(object):
                  shuttle_path=None,
                  drop_table_on_success=False,
                  jwt=None,
-                 org_engine=True):
+                 org_engine=True,
+                 workers=None,
+                 ordered=True,
+                 upload_method="multi",
+                 fetch_size=1000,
+                 pipelined=False,
+                 writers=1,
+                 queue_size=4,
+                 adaptive_chunks=False,
+                 memory_budget=256 * 2 ** 20,
+                 checkpoint=False,
+                 order_by=None,
+                 resume=False):
 
         # load integration definition
         local_config = dict()
@@ -88,6 +167,30 @@ class Integration(object):
             self.jwt = jwt
         if "org_engine" not in self.__dict__:
             self.org_engine = org_engine
+        if "workers" not in self.__dict__:
+            self.workers = workers
+        if "ordered" not in self.__dict__:
+            self.ordered = ordered
+        if "upload_method" not in self.__dict__:
+            self.upload_method = upload_method
+        if "fetch_size" not in self.__dict__:
+            self.fetch_size = fetch_size
+        if "pipelined" not in self.__dict__:
+            self.pipelined = pipelined
+        if "writers" not in self.__dict__:
+            self.writers = writers
+        if "queue_size" not in self.__dict__:
+            self.queue_size = queue_size
+        if "adaptive_chunks" not in self.__dict__:
+            self.adaptive_chunks = adaptive_chunks
+        if "memory_budget" not in self.__dict__:
+            self.memory_budget = memory_budget
+        if "checkpoint" not in self.__dict__:
+            self.checkpoint = checkpoint
+        if "order_by" not in self.__dict__:
+            self.order_by = order_by
+        if "resume" not in self.__dict__:
+            self.resume = resume
 
         if not self.clean_table_name_root:
             raise ValueError("No clean table name specified")
@@ -109,6 +212,14 @@ class Integration(object):
         else:
             self.engine = self.flight.get_atlas_engine_for_individual_user()
 
+    def _for_worker(self):
+        # cleaning workers get a copy of the integration without its engine, flight and API configuration
+        worker = copy.copy(self)
+        worker.engine = None
+        worker.flight = None
+        worker.configuration = None
+        return worker
+
     def clean_row(cls, row):
         raise NotImplementedError("clean_row is not defined for this integration.")
 
@@ -141,9 +252,18 @@ class Integration(object):
 
         dtypes = self.flight.get_pandas_datatypes_by_column()
 
+        checkpoint = self.checkpoint or self.resume
+        if checkpoint and self.sql and not self.order_by:
+            raise ValueError("Checkpointing a sql source needs an order_by column.")
+        if self.resume and self.standardize_clean_table_name:
+            raise ValueError("Resuming needs a fixed clean table name, set standardize_clean_table_name to False.")
+
         with self.engine.connect() as connection:
 
-            if self.engine.dialect.has_table(connection, clean_table_name):
+            last = self.get_last_checkpoint(clean_table_name, connection) if self.resume else None
+            if last is not None:
+                print(f"Resuming after chunk {last['chunk']}, with {last['rows_fetched']} rows fetched so far.")
+            elif self.engine.dialect.has_table(connection, clean_table_name):
                 if self.if_exists == "skip":
                     print("Clean table already exists. Skipping the cleaning step.")
                     print(f"{clean_table_name}")
@@ -153,41 +273,29 @@ class Integration(object):
                     connection.execute(f"drop table {clean_table_name};")
                 if self.if_exists == "fail":
                     raise Exception("Clean table name already in use.")
+            if checkpoint:
+                self.create_checkpoint_table(clean_table_name, connection, clear=last is None)
 
-            # TODO parallelize rowwise cleaning
-            if self.sql:
-                generator = pd.read_sql_query(
-                    self.sql,
-                    connection,
-                    chunksize=1000)
-            elif self.csv:
-                generator = pd.read_csv(self.csv, chunksize=1000)
+            sizer = self.get_chunk_sizer() if self.adaptive_chunks else None
+            if self.pipelined:
+                rows_fetched, rows_cleaned = self.run_pipeline(clean_table_name, dtypes, sizer=sizer, last=last)
             else:
-                raise ValueError("Can only clean and upload if we have sql or csv!")
-            rows_cleaned = 0
-            rows_fetched = 0
-            for chunk in generator:
-                rows_fetched += len(chunk)
-                cleaned_chunk = chunk
-                if self.cleaning_required:
-                    if self.rowwise:
-                        cleaned_chunk = chunk.apply(self.clean_row, axis=1)
+                rows_fetched = last["rows_fetched"] if last else 0
+                rows_cleaned = last["rows_cleaned"] if last else 0
+                chunk_number = last["chunk"] if last else 0
+                positions = collections.deque()
+                raw_chunks = self.read_positioned_chunks(positions, sizer=sizer, position=last["position"] if last else None)
+                for fetched, cleaned_chunk in self.clean_chunks(raw_chunks):
+                    rows_fetched += fetched
+                    rows_cleaned += len(cleaned_chunk)
+                    chunk_number += 1
+                    position = positions.popleft()
+                    if checkpoint:
+                        state = {"chunk": chunk_number, "position": position, "rows_fetched": rows_fetched, "rows_cleaned": rows_cleaned}
+                        self.upload_checkpointed_chunk(cleaned_chunk, clean_table_name, connection, dtypes, state)
                     else:
-                        dummy = self.clean_df(cleaned_chunk)
-                        if dummy is not None:
-                            cleaned_chunk = dummy
-                cleaned_chunk.to_sql(
-                    clean_table_name,
-                    connection,
-                    if_exists='append',
-                    dtype={col: (dtypes[col] if col in dtypes.keys() else sqlalchemy.sql.sqltypes.String) for col in
-                           cleaned_chunk.columns},
-                    index=False,
-                    chunksize=1000,
-                    method='multi'
-                )
-                rows_cleaned += len(cleaned_chunk)
-                print(f"Fetched and cleaned {rows_fetched} rows. Uploaded a total of {rows_cleaned} rows.")
+                        self.upload_chunk(cleaned_chunk, clean_table_name, connection, dtypes)
+                    print(f"Fetched and cleaned {rows_fetched} rows. Uploaded a total of {rows_cleaned} rows.")
             if rows_fetched == 0:
                 # meaning original dataset was actually empty
                 empty = pd.DataFrame(columns=dtypes.keys())
@@ -200,10 +308,388 @@ class Integration(object):
                 )
                 print(f"Input table is empty ! Uploaded a new empty table.")
 
+        self.run_summary = {"rows_fetched": rows_fetched, "rows_cleaned": rows_cleaned}
+        if sizer is not None:
+            self.run_summary["chunk_sizes"] = sizer.summary()
+            print(sizer)
         print("Cleaning completed successfully!")
         print(f"{clean_table_name}")
         return clean_table_name
 
+    def upload_chunk(self, cleaned_chunk, clean_table_name, connection, dtypes):
+        """
+        Appends a cleaned chunk to the clean table, creating it if needed.
+        """
+
+        cleaned_chunk.to_sql(
+            clean_table_name,
+            connection,
+            if_exists='append',
+            dtype={col: (dtypes[col] if col in dtypes.keys() else sqlalchemy.sql.sqltypes.String) for col in
+                   cleaned_chunk.columns},
+            index=False,
+            chunksize=1000 if self.upload_method == "multi" else None,
+            method=olpy.clean.atlas.to_sql_method(self.upload_method)
+        )
+
+    def upload_checkpointed_chunk(self, cleaned_chunk, clean_table_name, connection, dtypes, state, before_commit=None):
+        """
+        Appends a cleaned chunk to the clean table and records its checkpoint, in one transaction.
+
+        state has the chunk number, the position in the source after the chunk and the rows fetched and
+        cleaned up to and including the chunk. before_commit is called right before the checkpoint is recorded.
+        """
+
+        with connection.begin():
+            self.upload_chunk(cleaned_chunk, clean_table_name, connection, dtypes)
+            if before_commit is not None:
+                before_commit()
+            connection.execute(
+                sqlalchemy.text(
+                    f'INSERT INTO "{_get_checkpoint_table_name(clean_table_name)}" (chunk, position, rows_fetched, rows_cleaned) '
+                    'VALUES (:chunk, :position, :rows_fetched, :rows_cleaned)'
+                ),
+                state
+            )
+
+    def create_checkpoint_table(self, clean_table_name, connection, clear=False):
+        """
+        Creates the table recording the chunks committed to the clean table, next to it, if it doesn't exist yet.
+        """
+
+        checkpoint_table_name = _get_checkpoint_table_name(clean_table_name)
+        connection.execute(f"""
+            CREATE TABLE IF NOT EXISTS "{checkpoint_table_name}" (
+                chunk integer PRIMARY KEY,
+                position text,
+                rows_fetched bigint,
+                rows_cleaned bigint,
+                created_at timestamp with time zone DEFAULT now()
+            );""")
+        if clear:
+            connection.execute(f'DELETE FROM "{checkpoint_table_name}";')
+
+    def get_last_checkpoint(self, clean_table_name, connection):
+        """
+        Gets the last chunk committed to the clean table, as a dict like the state of upload_checkpointed_chunk.
+
+        Returns None if nothing was committed with checkpoints.
+        """
+
+        checkpoint_table_name = _get_checkpoint_table_name(clean_table_name)
+        if not self.engine.dialect.has_table(connection, checkpoint_table_name):
+            return None
+        row = connection.execute(
+            f'SELECT chunk, position, rows_fetched, rows_cleaned FROM "{checkpoint_table_name}" ORDER BY chunk DESC LIMIT 1;'
+        ).fetchone()
+        return dict(row._mapping) if row is not None else None
+
+    def run_pipeline(self, clean_table_name, dtypes, sizer=None, last=None):
+        """
+        Reads, cleans and uploads concurrently, returning the numbers of rows fetched and uploaded.
+
+        A reader thread, a cleaning thread (cleaning in a pool of processes if workers is more than 1)
+        and as many writer threads as writers, each on a connection of its own, are connected by queues
+        of at most queue_size chunks. The first chunk creates the clean table while the other writers
+        wait. With checkpoints, chunks are committed in order, after the chunk last committed. If any
+        stage fails, the others stop and the error is raised here.
+        """
+
+        checkpoint = self.checkpoint or self.resume
+        raw_queue = queue.Queue(maxsize=self.queue_size)
+        cleaned_queue = queue.Queue(maxsize=self.queue_size)
+        failed = threading.Event()
+        created = threading.Event()
+        table_lock = threading.Lock()
+        counts_lock = threading.Lock()
+        counts = {"fetched": last["rows_fetched"] if last else 0, "cleaned": last["rows_cleaned"] if last else 0}
+        turn = threading.Condition()
+        committed = {"chunk": last["chunk"] if last else 0}
+        errors = []
+        done = object()
+        if last is not None:
+            created.set()
+
+        def put(q, item):
+            while not failed.is_set():
+                try:
+                    q.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    pass
+            return False
+
+        def get(q):
+            while not failed.is_set():
+                try:
+                    return q.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+            return done
+
+        def stage(target):
+            def run():
+                try:
+                    target()
+                except BaseException as e:
+                    errors.append(e)
+                    failed.set()
+            return threading.Thread(target=run, daemon=True)
+
+        def read():
+            chunks = self.read_chunks(sizer=sizer, position=last["position"] if last else None)
+            position = last["position"] if last else None
+            with contextlib.closing(chunks):
+                for chunk in chunks:
+                    position = self.get_position(chunk, position)
+                    with counts_lock:
+                        counts["fetched"] += len(chunk)
+                    if not put(raw_queue, (chunk, position)):
+                        return
+            put(raw_queue, done)
+
+        positions = collections.deque()
+
+        def raw_chunks():
+            item = get(raw_queue)
+            while item is not done:
+                chunk, position = item
+                positions.append(position)
+                yield chunk
+                item = get(raw_queue)
+
+        def clean():
+            # chunks come out of clean_chunks in order when checkpointing, so the running totals are those of the source
+            state = last or {"chunk": 0, "rows_fetched": 0, "rows_cleaned": 0}
+            with contextlib.closing(self.clean_chunks(raw_chunks())) as cleaned_chunks:
+                for fetched, cleaned_chunk in cleaned_chunks:
+                    state = {
+                        "chunk": state["chunk"] + 1,
+                        "position": positions.popleft(),
+                        "rows_fetched": state["rows_fetched"] + fetched,
+                        "rows_cleaned": state["rows_cleaned"] + len(cleaned_chunk)
+                    }
+                    if not put(cleaned_queue, (state, cleaned_chunk)):
+                        return
+            for _ in range(self.writers):
+                put(cleaned_queue, done)
+
+        def wait_for_turn(chunk):
+            with turn:
+                while committed["chunk"] != chunk - 1:
+                    if failed.is_set():
+                        raise RuntimeError("Stopped waiting to commit, another stage failed.")
+                    turn.wait(0.1)
+
+        def upload(connection, state, cleaned_chunk):
+            if checkpoint:
+                if not created.is_set():
+                    # the first chunk of the run creates the table, the others have to wait for it
+                    wait_for_turn(state["chunk"])
+                self.upload_checkpointed_chunk(
+                    cleaned_chunk, clean_table_name, connection, dtypes, state,
+                    before_commit=lambda: wait_for_turn(state["chunk"])
+                )
+                with turn:
+                    committed["chunk"] = state["chunk"]
+                    turn.notify_all()
+                created.set()
+            elif created.is_set():
+                self.upload_chunk(cleaned_chunk, clean_table_name, connection, dtypes)
+            else:
+                with table_lock:
+                    self.upload_chunk(cleaned_chunk, clean_table_name, connection, dtypes)
+                    created.set()
+
+        def write():
+            with self.engine.connect() as connection:
+                item = get(cleaned_queue)
+                while item is not done:
+                    state, cleaned_chunk = item
+                    upload(connection, state, cleaned_chunk)
+                    with counts_lock:
+                        counts["cleaned"] += len(cleaned_chunk)
+                        print(f"Fetched {counts['fetched']} rows. Cleaned and uploaded a total of {counts['cleaned']} rows.")
+                    item = get(cleaned_queue)
+
+        threads = [stage(read), stage(clean)] + [stage(write) for _ in range(self.writers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if errors:
+            raise errors[0]
+        return counts["fetched"], counts["cleaned"]
+
+    def read_chunks(self, sizer=None, position=None):
+        """
+        Yields the raw data in chunks of fetch_size rows, or of the sizes picked by a ChunkSizer.
+
+        SQL sources are read through a server-side cursor, on a connection of their own, so only about
+        one chunk of the result is held in memory however big the source is. They are sorted by order_by,
+        if given. position, as from get_position, is where to start: after that value of order_by, or
+        after that many rows of a csv (which are read and dropped chunk by chunk).
+
+        order_by doesn't have to be unique: with checkpoints, a chunk is extended past its size until the
+        value of order_by changes, so that resuming after the chunk's last value doesn't skip any rows.
+        """
+
+        if self.sql:
+            sql = self.sql
+            parameters = None
+            if self.order_by:
+                key = '"%s"' % self.order_by
+                sql = "SELECT * FROM (%s) foo" % sql.replace(";", "")
+                if position is not None:
+                    # the position is a (pyformat) parameter, so any % in the query has to be escaped
+                    sql = sql.replace("%", "%%") + " WHERE %s > %%(position)s" % key
+                    parameters = {"position": position}
+                sql = "%s ORDER BY %s" % (sql, key)
+            with self.engine.connect() as connection:
+                streaming = connection.execution_options(stream_results=True, max_row_buffer=self.fetch_size)
+                result = streaming.exec_driver_sql(sql, parameters) if parameters else streaming.exec_driver_sql(sql)
+                columns = list(result.keys())
+                key_index = columns.index(self.order_by) if self.order_by else None
+                whole_keys = key_index is not None and (self.checkpoint or self.resume)
+                held = []
+
+                def fetch(size):
+                    rows = held + (result.fetchmany(size - len(held)) if size > len(held) else [])
+                    del held[:]
+                    if whole_keys and len(rows) == size:
+                        # finish the run of the last key, holding back the first row after it for the next chunk
+                        row = result.fetchone()
+                        while row is not None and row[key_index] == rows[-1][key_index]:
+                            rows.append(row)
+                            row = result.fetchone()
+                        if row is not None:
+                            held.append(row)
+                    chunk = pd.DataFrame.from_records(rows, columns=columns, coerce_float=True)
+                    if rows and key_index is not None:
+                        # the last key as the database returned it, before pandas turns nullable integers
+                        # and decimals into floats, for get_position
+                        chunk.attrs["order_by"] = rows[-1][key_index]
+                    return chunk
+
+                for chunk in self._sized_chunks(fetch, sizer):
+                    yield chunk
+        elif self.csv:
+            with pd.read_csv(self.csv, iterator=True) as reader:
+                skipped = 0
+                while position and skipped < int(position):
+                    chunk = _get_chunk(reader, min(self.fetch_size, int(position) - skipped))
+                    if chunk.empty:
+                        break
+                    skipped += len(chunk)
+                for chunk in self._sized_chunks(lambda size: _get_chunk(reader, size), sizer):
+                    yield chunk
+        else:
+            raise ValueError("Can only clean and upload if we have sql or csv!")
+
+    def read_positioned_chunks(self, positions, sizer=None, position=None):
+        """
+        Yields the chunks of read_chunks, appending the position after every chunk to positions.
+        """
+
+        for chunk in self.read_chunks(sizer=sizer, position=position):
+            position = self.get_position(chunk, position)
+            positions.append(position)
+            yield chunk
+
+    def get_position(self, chunk, previous):
+        """
+        Gets the position in the source after a raw chunk, given the position before it.
+
+        That is the last value of order_by for sql sources (None without order_by), or the number of rows read for csvs.
+        Checkpointing a sql source fails on a null order_by value, as there is no position after it.
+        """
+
+        if self.sql:
+            if not self.order_by:
+                return None
+            key = chunk.attrs.get("order_by")
+            if key is None:
+                if self.checkpoint or self.resume:
+                    raise ValueError(f"Can't checkpoint after a null value of order_by column {self.order_by}.")
+                return None
+            return str(key)
+        return str(int(previous or 0) + len(chunk))
+
+    def _sized_chunks(self, fetch, sizer):
+        # the time of a chunk runs until the next one is asked for, so it includes cleaning and uploading
+        # (or, when pipelined, waiting for room in the queue)
+        size = self.fetch_size
+        while True:
+            start = time.time()
+            chunk = fetch(size)
+            if chunk.empty:
+                return
+            yield chunk
+            if sizer is not None:
+                size = sizer.record(len(chunk), time.time() - start, _get_bytes_per_row(chunk))
+
+    def get_chunk_sizer(self):
+        """
+        Gets a ChunkSizer for a run, starting at fetch_size rows and keeping the chunks in memory within memory_budget.
+        """
+
+        chunks_in_memory = 2
+        if self.cleaning_required and self.workers and self.workers > 1:
+            chunks_in_memory += 2 * self.workers
+        if self.pipelined:
+            chunks_in_memory += 2 * self.queue_size + self.writers
+        return ChunkSizer(size=self.fetch_size, memory_budget=self.memory_budget, chunks_in_memory=chunks_in_memory)
+
+    def clean_chunk(self, chunk):
+        """
+        Cleans one chunk of raw data with clean_row or clean_df, as determined by determine_rowwise.
+        """
+
+        if not self.cleaning_required:
+            return chunk
+        if self.rowwise:
+            return chunk.apply(self.clean_row, axis=1)
+        cleaned_chunk = self.clean_df(chunk)
+        return chunk if cleaned_chunk is None else cleaned_chunk
+
+    def clean_chunks(self, chunks):
+        """
+        Yields (number of raw rows, cleaned chunk) for every chunk of raw data.
+
+        With workers set to more than 1, chunks are cleaned in a pool of that many processes, while
+        reading and uploading stay in this process. At most two chunks per worker are in flight. If
+        ordered is False (and there are no checkpoints), chunks are yielded as soon as they are clean
+        rather than in the order read. Workers get a pickled copy of the integration without engine,
+        flight and configuration, so clean_row and clean_df can't use those there.
+        """
+
+        if not self.cleaning_required or not self.workers or self.workers <= 1:
+            for chunk in chunks:
+                yield len(chunk), self.clean_chunk(chunk)
+            return
+
+        worker = self._for_worker()
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            pending = collections.deque()
+            try:
+                for chunk in chunks:
+                    pending.append((len(chunk), executor.submit(worker.clean_chunk, chunk)))
+                    while len(pending) >= 2 * self.workers:
+                        yield self._pop_cleaned(pending)
+                while pending:
+                    yield self._pop_cleaned(pending)
+            except BaseException:
+                executor.shutdown(wait=False, cancel_futures=True)
+                raise
+
+    def _pop_cleaned(self, pending):
+        # checkpoints need the chunks in order
+        if not self.ordered and not self.checkpoint and not self.resume:
+            wait([future for _, future in pending], return_when=FIRST_COMPLETED)
+            pending.rotate(-next(i for i, (_, future) in enumerate(pending) if future.done()))
+        fetched, future = pending.popleft()
+        return fetched, future.result()
+
     def integrate_table(self, clean_table_name=None, shuttle_path=None, shuttle_args=None, drop_table_on_success=None,
                         memory_size=None, local=False, sql=None, flight_path=None):
 
@@ -306,6 +792,8 @@ class Integration(object):
         if drop_table_on_success and clean_table_name:
             self.engine.execute(f"DROP TABLE {clean_table_name};")
             print(f"Dropped table {clean_table_name}")
+            if self.checkpoint or self.resume:
+                self.engine.execute(f'DROP TABLE IF EXISTS "{_get_checkpoint_table_name(clean_table_name)}";')
 
     def integrate(self, shuttle_path=None, shuttle_args=None, drop_table_on_success=None):
         table = self.clean_and_upload()
@@ -315,3 +803,20 @@ class Integration(object):
             shuttle_args=shuttle_args,
             drop_table_on_success=drop_table_on_success
         )
+
+
+def _get_checkpoint_table_name(clean_table_name):
+    return f"{clean_table_name}_checkpoints"
+
+
+def _get_chunk(reader, size):
+    try:
+        return reader.get_chunk(size)
+    except StopIteration:
+        return pd.DataFrame()
+
+
+def _get_bytes_per_row(chunk):
+    # deep memory usage is slow on object columns, so it's measured on a sample
+    sample = chunk.head(1000)
+    return float(sample.memory_usage(index=False, deep=True).sum()) / max(len(sample), 1)
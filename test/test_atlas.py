@@ -0,0 +1,84 @@
+import datetime
+import os
+import tempfile
+import unittest
+import numpy as np
+import pandas as pd
+import sqlalchemy
+from types import SimpleNamespace
+from geoalchemy2 import Geometry, WKTElement
+from olpy.clean import atlas
+
+
+class TestCopyText(unittest.TestCase):
+
+    def test_null(self):
+        self.assertEqual(atlas._copy_text(None), "\\N")
+
+    def test_escaping(self):
+        self.assertEqual(atlas._copy_text("a\tb\nc\rd\\e"), "a\\tb\\nc\\rd\\\\e")
+        self.assertEqual(atlas._copy_text("\\N"), "\\\\N")
+
+    def test_numbers(self):
+        self.assertEqual(atlas._copy_text(1.0), "1")
+        self.assertEqual(atlas._copy_text(np.float64(-3.0)), "-3")
+        self.assertEqual(atlas._copy_text(1.5), "1.5")
+        self.assertEqual(atlas._copy_text(np.int64(7)), "7")
+        self.assertEqual(atlas._copy_text(True), "True")
+
+    def test_bytes(self):
+        # COPY unescapes \\x to \x, the bytea hex format
+        self.assertEqual(atlas._copy_text(b"ab"), "\\\\x6162")
+        self.assertEqual(atlas._copy_text(bytearray(b"\x00\xff")), "\\\\x00ff")
+
+    def test_datetimes(self):
+        self.assertEqual(atlas._copy_text(datetime.date(2000, 1, 2)), "2000-01-02")
+        self.assertEqual(atlas._copy_text(datetime.datetime(2000, 1, 2, 3, 4, 5)), "2000-01-02 03:04:05")
+        self.assertEqual(
+            atlas._copy_text(pd.Timestamp("2000-01-02 03:04:05", tz = "UTC")), "2000-01-02 03:04:05+00:00"
+        )
+
+    def test_geometries(self):
+        self.assertEqual(atlas._copy_text(WKTElement("POINT(1 2)", srid = 4326)), "SRID=4326;POINT(1 2)")
+        self.assertEqual(atlas._copy_text("POINT(1 2)", srid = 4326), "SRID=4326;POINT(1 2)")
+        self.assertEqual(atlas._copy_text(WKTElement("SRID=3857;POINT(1 2)", extended = True), srid = 4326), "SRID=3857;POINT(1 2)")
+        self.assertEqual(atlas._copy_text(WKTElement("POINT(1 2)")), "POINT(1 2)")
+
+    def test_copy_geometry_column(self):
+        copied = []
+
+        class Cursor(object):
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *args):
+                pass
+
+            def copy_expert(self, sql, buffer):
+                copied.append((sql, buffer.read()))
+
+        metadata = sqlalchemy.MetaData()
+        table = sqlalchemy.Table("places", metadata, sqlalchemy.Column("name", sqlalchemy.Text), sqlalchemy.Column("geom", Geometry("POINT", srid = 4326)))
+        connection = SimpleNamespace(connection = SimpleNamespace(cursor = Cursor))
+        atlas.psql_insert_copy(SimpleNamespace(name = "places", schema = None, table = table), connection, ["name", "geom"], [("a", "POINT(1 2)")])
+        self.assertEqual(copied, [('COPY "places" ("name", "geom") FROM STDIN', "a\tSRID=4326;POINT(1 2)\n")])
+
+
+class TestReadSqlChunks(unittest.TestCase):
+
+    def test_chunks(self):
+        with tempfile.TemporaryDirectory() as directory:
+            engine = sqlalchemy.create_engine("sqlite:///" + os.path.join(directory, "source.sqlite"))
+            with engine.connect() as connection:
+                connection.execute("CREATE TABLE source (id integer, name text)")
+                for i in range(25):
+                    connection.execute("INSERT INTO source VALUES (%d, 'x')" % i)
+            chunks = list(atlas.read_sql_chunks("SELECT id, name FROM source ORDER BY id", engine, 10))
+            engine.dispose()
+        self.assertEqual([len(chunk) for chunk in chunks], [10, 10, 5])
+        self.assertEqual(list(chunks[0].columns), ["id", "name"])
+        self.assertEqual(int(chunks[-1]["id"].iloc[-1]), 24)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,136 @@
+import os
+import tempfile
+import unittest
+import openlattice
+from types import SimpleNamespace
+from olpy.clean import report
+from olpy.flight import edm
+
+
+def _fqn(namespace, name):
+    return SimpleNamespace(namespace = namespace, name = name)
+
+
+class FakeEdmApi(object):
+
+    def __init__(self):
+        self.calls = 0
+        self.person = SimpleNamespace(id = "e1", type = _fqn("general", "person"), key = ["p1"], properties = ["p1", "p2"])
+        self.appears_in = SimpleNamespace(id = "e2", type = _fqn("ol", "appearsin"), key = ["p1"], properties = ["p1"])
+        self.property_types = [
+            SimpleNamespace(id = "p1", type = _fqn("nc", "SubjectIdentification"), datatype = "String"),
+            SimpleNamespace(id = "p2", type = _fqn("nc", "PersonBirthDate"), datatype = "Date")
+        ]
+
+    def get_all_property_types(self):
+        self.calls += 1
+        return self.property_types
+
+    def get_all_entity_types(self):
+        self.calls += 1
+        return [self.person, self.appears_in]
+
+    def get_all_association_types(self):
+        self.calls += 1
+        return [SimpleNamespace(entity_type = self.appears_in, src = ["e1"], dst = ["e1"])]
+
+
+class VersionedEdmApi(FakeEdmApi):
+
+    def get_entity_data_model_version(self):
+        self.calls += 1
+        return "v1"
+
+
+class TestEdmCache(unittest.TestCase):
+
+    def test_bulk_load(self):
+        api = FakeEdmApi()
+        cache = edm.EdmCache(api)
+
+        property_type = cache.get_property_type(cache.get_property_type_id(namespace = "nc", name = "PersonBirthDate"))
+        self.assertEqual(property_type.datatype, "Date")
+        entity_type = cache.get_entity_type(cache.get_entity_type_id(namespace = "general", name = "person"))
+        self.assertEqual(entity_type.key, ["p1"])
+        association_type = cache.get_association_type(cache.get_entity_type_id(namespace = "ol", name = "appearsin"))
+        self.assertEqual(association_type.src, ["e1"])
+
+        # everything above was served by the three bulk calls
+        self.assertEqual(api.calls, 3)
+
+    def test_shared_cache_per_token(self):
+        def api(token):
+            return SimpleNamespace(api_client = SimpleNamespace(configuration = SimpleNamespace(host = "https://example.org", access_token = token)))
+
+        first = api("token-1")
+        self.assertIs(edm.get_shared_edm_cache(first), edm.get_shared_edm_cache(api("token-1")))
+        other = edm.get_shared_edm_cache(api("token-2"))
+        self.assertIsNot(other, edm.get_shared_edm_cache(first))
+        self.assertIs(edm.get_shared_edm_cache(first).edm_api, first)
+
+        # refreshed tokens don't pile up
+        for i in range(10):
+            edm.get_shared_edm_cache(api("refreshed-%d" % i))
+        self.assertEqual(len(edm._shared_caches), edm.MAX_SHARED_CACHES)
+        self.assertNotIn(("https://example.org", "token-1"), edm._shared_caches)
+
+    def test_version_without_load(self):
+        api = VersionedEdmApi()
+        cache = edm.EdmCache(api)
+        self.assertEqual(cache.get_version(), "v1")
+        self.assertFalse(cache.loaded)
+        self.assertEqual(api.calls, 1)
+
+    def test_snapshot_file_version(self):
+        class SnapshotEdmApi(object):
+            def get_entity_data_model_version(self):
+                return "v1"
+
+            def get_all_property_types(self):
+                return [openlattice.PropertyType(
+                    id = "p1", type = openlattice.FullQualifiedName(namespace = "nc", name = "SubjectIdentification"),
+                    title = "Subject", datatype = "String"
+                )]
+
+            def get_all_entity_types(self):
+                return []
+
+            def get_all_association_types(self):
+                return []
+
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, "edm.json")
+            edm.write_snapshot_file(filename, SnapshotEdmApi())
+            edm_cache, _ = edm.read_snapshot_file(filename)
+        self.assertEqual(edm_cache.get_version(), "v1")
+        self.assertEqual(edm_cache.get_property_type_id(namespace = "nc", name = "SubjectIdentification"), "p1")
+
+    def test_name_index(self):
+        pool = [
+            SimpleNamespace(type = _fqn("general", "person"), title = "Person", description = ""),
+            SimpleNamespace(type = _fqn("ol", "person"), title = "Person", description = ""),
+            SimpleNamespace(type = _fqn("old", "person"), title = "Person", description = "-d"),
+            SimpleNamespace(type = _fqn("ol", "vehicle"), title = "Vehicle", description = "")
+        ]
+        index = edm.EdmNameIndex(pool)
+
+        self.assertEqual(index.lookup("Person"), {"general": "person", "ol": "person"})
+        self.assertEqual(index.suggest("ol.persn")[0], "ol.person")
+        self.assertNotIn("old.person", index.suggest("ol.persn"))
+
+    def test_instrumentation(self):
+        cache = edm.EdmCache(FakeEdmApi())
+
+        @report.instrumented
+        def validator():
+            cache.get_property_type_id(namespace = "nc", name = "PersonBirthDate")
+            cache.get_property_type_id(namespace = "nc", name = "PersonBirthDate")
+            return report.ValidationReport(title = "Lookups")
+
+        result = validator()
+        self.assertEqual((result.api_calls, result.cache_hits, result.cache_misses), (3, 2, 0))
+        self.assertIsNotNone(result.wall_time)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,217 @@
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+import openlattice
+import pandas as pd
+from olpy.clean import atlas
+from olpy.clean.report import ValidationReport, instrumented
+from olpy.flight import Flight, edm, validation
+from olpy.flight.flight import _load_flight_dict
+
+FLIGHT = '''organizationId: 00000000-0000-0000-0000-000000000000
+entityDefinitions:
+  person:
+    fqn: "general.person"
+    entitySetName: "DemoPeople"
+    propertyDefinitions:
+      nc.SubjectIdentification:
+        type: "nc.SubjectIdentification"
+        transforms:
+          - !<transforms.HashTransform>
+            columns: ["first", "last"]
+            hashFunction: "sha256"
+      ol.description:
+        type: "ol.description"
+        transforms:
+          - !<transforms.ConcatCombineTransform>
+            transforms:
+              - !<transforms.ColumnTransform>
+                column: "notes"
+              - !<transforms.ValueTransform>
+                value: "a -> b"
+    conditions:
+      - !<conditions.ConditionalOr> {}
+      - !<conditions.BooleanIsNullCondition>
+        column: "first"
+        reverse: true
+    name: "person"
+associationDefinitions: {}
+'''
+
+
+def _make_flight():
+    # an empty EDM: every lookup misses, without touching the network
+    edm_cache = edm.EdmCache()
+    edm_cache.index()
+    flight = Flight(configuration = openlattice.Configuration(), edm_cache = edm_cache)
+    flight.deserialize_from_string(FLIGHT, None)
+    return flight
+
+
+class TestFlight(unittest.TestCase):
+
+    def test_load_tags(self):
+        person = _load_flight_dict(FLIGHT)['entityDefinitions']['person']
+        self.assertEqual(
+            person['propertyDefinitions']['nc.SubjectIdentification']['transforms'],
+            [{"transforms.HashTransform": None, "columns": ["first", "last"], "hashFunction": "sha256"}]
+        )
+        self.assertEqual(person['conditions'][0], {"conditions.ConditionalOr": {}})
+        self.assertEqual(
+            person['propertyDefinitions']['ol.description']['transforms'][0]['transforms'][1],
+            {"transforms.ValueTransform": None, "value": "a -> b"}
+        )
+
+    def test_serialize_roundtrip(self):
+        flight = _make_flight()
+        reloaded = _load_flight_dict(str(flight))
+        self.assertEqual(
+            reloaded['entityDefinitions']['person']['propertyDefinitions'],
+            _load_flight_dict(FLIGHT)['entityDefinitions']['person']['propertyDefinitions']
+        )
+
+    def test_serialize_offline(self):
+        flight = _make_flight()
+
+        @instrumented
+        def serialize():
+            self.assertEqual(
+                list(_load_flight_dict(str(flight))['entityDefinitions']['person']['propertyDefinitions'].keys()),
+                ["nc.SubjectIdentification", "ol.description"]
+            )
+            return ValidationReport(title = "Serialize")
+
+        result = serialize()
+        self.assertEqual((result.api_calls, result.cache_hits, result.cache_misses), (0, 0, 0))
+
+    def test_column_index(self):
+        flight = _make_flight()
+        self.assertEqual(flight.get_all_columns(), {"first", "last", "notes"})
+        self.assertEqual([p.type for p in flight.get_column_index()["notes"]], ["ol.description"])
+
+        # editing a definition invalidates the cached columns
+        flight.entity_definitions['person'].property_definitions['ol.description'].column = "summary"
+        self.assertIn("summary", flight.get_all_columns())
+
+    def test_refresh_schema(self):
+        flight = _make_flight()
+        flight.name = "demo"
+        flight.refresh_schema()
+        self.assertEqual(flight.schema["entityDefinitions"]["person"]["flight"], "demo")
+        # the schema cached by the definition is left as it is
+        self.assertNotIn("flight", flight.entity_definitions["person"].get_schema())
+
+    def test_graph_index(self):
+        flight = _make_flight()
+        index = flight.get_graph_index()
+        self.assertIs(flight.get_graph_index(), index)
+        self.assertEqual(index.entities_by_name, {"person": ["person"]})
+
+        # renaming or adding a definition invalidates the index
+        flight.entity_definitions['person'].name = "people"
+        self.assertEqual(flight.get_graph_index().entities_by_name, {"people": ["person"]})
+        flight.entity_definitions['other'] = flight.entity_definitions.pop('person')
+        self.assertEqual(flight.get_graph_index().entities_by_name, {"people": ["other"]})
+        self.assertIs(flight.get_entity_definition_by_name("people"), flight.entity_definitions['other'])
+
+    def test_compile_roundtrip(self):
+        flight = _make_flight()
+        with tempfile.TemporaryDirectory() as directory:
+            filename = os.path.join(directory, "flight.olflight")
+            flight.compile(filename)
+            compiled = Flight(configuration = openlattice.Configuration(), edm_cache = flight.edm_api)
+            compiled.deserialize_compiled(filename)
+        self.assertEqual(str(compiled), str(flight))
+        self.assertEqual(compiled.get_all_columns(), flight.get_all_columns())
+        self.assertIsNotNone(compiled.entity_definitions['person'].entity_type)
+
+    def test_validation_cache(self):
+        report = ValidationReport(title = "check", validated = False, issues = ["bad"], sub_reports = [ValidationReport(title = "sub")])
+        key = validation.get_key("check", {"fqn": "general.person"}, "v1")
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "validation.sqlite")
+            validation.ValidationCache(path).put(key, report)
+            # a new cache (as in another process) reads the persisted report
+            self.assertEqual(validation.ValidationCache(path).get(key), report)
+            self.assertIsNone(validation.ValidationCache(path).get(validation.get_key("check", {"fqn": "general.person"}, "v2")))
+
+    def test_validation_key_versions(self):
+        key = validation.get_key("check", {"fqn": "general.person"}, "v1")
+        version = validation.VALIDATOR_VERSION
+        try:
+            validation.VALIDATOR_VERSION += 1
+            self.assertNotEqual(validation.get_key("check", {"fqn": "general.person"}, "v1"), key)
+        finally:
+            validation.VALIDATOR_VERSION = version
+
+    def test_cached_validation_logging(self):
+        flight = _make_flight()
+        flight.edm_api.version = "v1"
+        person = flight.entity_definitions['person']
+        cache = validation.get_shared_validation_cache()
+        cache.clear()
+        cached = ValidationReport(title = "Parsers", validated = False, issues = ["bad"], sub_reports = [ValidationReport(title = "Sub", validated = False, issues = ["worse"])])
+        cache.put(person.get_validation_key("EntityDefinition.parsers_validation"), cached)
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            report = person.parsers_validation(log_level = "all")
+        cache.clear()
+        self.assertEqual(report.title, "Parsers")
+        # the sub reports are printed on a cache hit too
+        self.assertIn("Sub: FAILED.", output.getvalue())
+        self.assertIn("Parsers: FAILED.", output.getvalue())
+
+    def test_data_preflight(self):
+        flight = _make_flight()
+        description = flight.entity_definitions['person'].property_definitions['ol.description']
+        description.column = "notes"
+        description.transforms = [{"transforms.DateTransform": None, "pattern": ["MM/dd/yyyy", "yyyy-MM-dd"]}]
+        df = pd.DataFrame({"notes": ["01/02/2000", "2000-01-02", "soon", None]})
+        report = flight.data_preflight_validation(df = df, chunksize = 3)
+        self.assertFalse(report.validated)
+        self.assertIn("1 of 3 values", report.sub_reports[0].issues[0])
+
+    def test_infer_date_patterns(self):
+        flight = _make_flight()
+        description = flight.entity_definitions['person'].property_definitions['ol.description']
+        description.column = "notes"
+        description.transforms = []
+        description.property_type = openlattice.PropertyType(datatype = "Date")
+        df = pd.DataFrame({"notes": ["1/2/2000", "12/31/2000", "2000-01-05", None]})
+        description.add_datatype_parser_if_needed(df = df)
+        self.assertEqual(description.transforms, [{"transforms.DateTransform": None, "pattern": ["M/d/yyyy", "yyyy-MM-dd"]}])
+
+        description.transforms = []
+        description.property_type = openlattice.PropertyType(datatype = "DateTimeOffset")
+        description.add_datatype_parser_if_needed(df = df)
+        self.assertEqual(description.transforms, [{"transforms.DateAsDateTimeTransform": None, "pattern": ["M/d/yyyy", "yyyy-MM-dd"]}])
+
+        description.transforms = []
+        df = pd.DataFrame({"notes": ["2000-01-02 10:30:00", "2000-01-05 08:00:00", None]})
+        description.add_datatype_parser_if_needed(df = df)
+        self.assertEqual(description.transforms, [{"transforms.DateTimeTransform": None, "pattern": ["yyyy-MM-dd HH:mm:ss"]}])
+
+    def test_profile(self):
+        flight = _make_flight()
+        df = pd.DataFrame({"first": ["a", "b", "b", None], "last": ["x", "x", "x", "y"], "other": [1, 2, 3, 4]})
+        profile = atlas.profile(df = df, columns = flight.get_all_columns(), column_groups = [("first", "last")])
+        self.assertEqual(profile.row_count, 4)
+        self.assertEqual(list(profile.columns.index), ["first", "last"])
+        self.assertEqual(profile.columns.loc["first", "nulls"], 1)
+        self.assertEqual(profile.columns.loc["last", "distinct"], 2)
+        self.assertEqual(profile.groups[("first", "last")], 3)
+
+    def test_profile_source_without_keys(self):
+        # the empty EDM has no entity type, so no key columns
+        flight = _make_flight()
+        self.assertIsNone(flight.entity_definitions['person'].get_columns_from_pk())
+        df = pd.DataFrame({"first": ["a", None], "last": ["x", "y"], "notes": ["n", "n"]})
+        profile = flight.profile_source(df = df)
+        self.assertEqual(profile.row_count, 2)
+        self.assertEqual(profile.groups, {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,143 @@
+import collections
+import contextlib
+import copy
+import os
+import random
+import tempfile
+import time
+import unittest
+import pandas as pd
+import sqlalchemy
+from olpy.pipelines.integration import Integration
+
+
+class DoublingIntegration(Integration):
+
+    def clean_row(self, row):
+        row["a"] = row["a"] * 2
+        return row
+
+
+class CheckpointedIntegration(DoublingIntegration):
+    # records the checkpoints instead of writing them to a database
+
+    def upload_checkpointed_chunk(self, cleaned_chunk, clean_table_name, connection, dtypes, state, before_commit=None):
+        time.sleep(random.random() / 100)
+        if before_commit is not None:
+            before_commit()
+        self.committed.append(state)
+
+
+class FakeEngine(object):
+
+    def connect(self):
+        return contextlib.nullcontext(object())
+
+
+def _make_integration(cls = DoublingIntegration, **options):
+    # skips __init__, which connects to the API and the database
+    integration = object.__new__(cls)
+    integration.__dict__.update(
+        cleaning_required = True, rowwise = None, workers = None, ordered = True, checkpoint = False, resume = False,
+        sql = None, csv = None, order_by = None, fetch_size = 10, queue_size = 2, writers = 1,
+        engine = object(), flight = object(), configuration = object()
+    )
+    integration.__dict__.update(options)
+    integration.determine_rowwise()
+    return integration
+
+
+class TestIntegration(unittest.TestCase):
+
+    def test_copy_keeps_engine(self):
+        integration = _make_integration()
+        self.assertIs(copy.copy(integration).engine, integration.engine)
+        worker = integration._for_worker()
+        self.assertIsNone(worker.engine)
+        self.assertIsNone(worker.flight)
+        self.assertIsNotNone(integration.flight)
+
+    def test_clean_chunks_in_workers(self):
+        chunks = [pd.DataFrame({"a": range(i * 10, i * 10 + 10)}) for i in range(6)]
+        integration = _make_integration(workers = 2)
+        cleaned = list(integration.clean_chunks(iter(chunks)))
+        self.assertEqual([fetched for fetched, _ in cleaned], [10] * 6)
+        self.assertEqual([int(chunk["a"].iloc[0]) for _, chunk in cleaned], [0, 20, 40, 60, 80, 100])
+        self.assertIsNotNone(integration.engine)
+
+    def test_csv_positions(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "source.csv")
+            pd.DataFrame({"a": range(25)}).to_csv(path, index = False)
+            integration = _make_integration(csv = path)
+
+            positions = collections.deque()
+            chunks = list(integration.read_positioned_chunks(positions))
+            self.assertEqual([len(chunk) for chunk in chunks], [10, 10, 5])
+            self.assertEqual(list(positions), ["10", "20", "25"])
+
+            # resuming skips the rows already read
+            resumed = list(integration.read_positioned_chunks(positions, position = "13"))
+            self.assertEqual([len(chunk) for chunk in resumed], [10, 2])
+            self.assertEqual(int(resumed[0]["a"].iloc[0]), 13)
+            self.assertEqual(list(positions)[-2:], ["23", "25"])
+
+    def test_sql_positions(self):
+        with tempfile.TemporaryDirectory() as directory:
+            engine = sqlalchemy.create_engine("sqlite:///" + os.path.join(directory, "source.sqlite"))
+            with engine.connect() as connection:
+                connection.execute("CREATE TABLE source (id integer, name text)")
+                connection.execute("INSERT INTO source VALUES (NULL, 'x')")
+                for i in range(1, 16):
+                    connection.execute("INSERT INTO source VALUES (%d, 'y')" % i)
+            integration = _make_integration(sql = "SELECT * FROM source", order_by = "id", engine = engine)
+
+            positions = collections.deque()
+            chunks = list(integration.read_positioned_chunks(positions))
+            # the null makes the first chunk's ids floats, but the position keeps the database's value
+            self.assertEqual(chunks[0]["id"].dtype, "float64")
+            self.assertEqual(list(positions), ["9", "15"])
+
+            # sqlite sorts nulls first, where there is no position to checkpoint
+            integration = _make_integration(sql = "SELECT * FROM source", order_by = "id", engine = engine, checkpoint = True, fetch_size = 1)
+            with self.assertRaises(ValueError):
+                list(integration.read_positioned_chunks(positions))
+            engine.dispose()
+
+    def test_sql_duplicate_keys(self):
+        with tempfile.TemporaryDirectory() as directory:
+            engine = sqlalchemy.create_engine("sqlite:///" + os.path.join(directory, "source.sqlite"))
+            with engine.connect() as connection:
+                connection.execute("CREATE TABLE source (id integer, name text)")
+                # four rows with id 9 straddle the end of the first chunk
+                for i in list(range(1, 9)) + [9] * 4 + list(range(10, 16)):
+                    connection.execute("INSERT INTO source VALUES (%d, 'y')" % i)
+            integration = _make_integration(sql = "SELECT * FROM source", order_by = "id", engine = engine, checkpoint = True)
+
+            positions = collections.deque()
+            chunks = list(integration.read_positioned_chunks(positions))
+            engine.dispose()
+        self.assertEqual([len(chunk) for chunk in chunks], [12, 6])
+        self.assertEqual(list(positions), ["9", "15"])
+        # resuming after a chunk's last id skips nothing
+        for chunk, position in zip(chunks[:-1], positions):
+            self.assertEqual(int(chunk["id"].iloc[-1]), int(position))
+        self.assertTrue((chunks[1]["id"] > 9).all())
+
+    def test_checkpointed_pipeline(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "source.csv")
+            pd.DataFrame({"a": range(45)}).to_csv(path, index = False)
+            for last in [None, {"chunk": 2, "position": "20", "rows_fetched": 20, "rows_cleaned": 20}]:
+                integration = _make_integration(
+                    CheckpointedIntegration, csv = path, engine = FakeEngine(), checkpoint = True, writers = 3, committed = []
+                )
+                integration.run_pipeline("clean", {}, last = last)
+                first = last["chunk"] + 1 if last else 1
+                self.assertEqual([state["chunk"] for state in integration.committed], list(range(first, 6)))
+                self.assertEqual(integration.committed[-1]["position"], "45")
+                self.assertEqual(integration.committed[-1]["rows_fetched"], 45)
+
+
+if __name__ == '__main__':
+    unittest.main()